@@ -0,0 +1,239 @@
+"""Local stand-ins for YouTube and the video platforms, used by the benchmarks.
+
+* :class:`FakeYouTubeServer` speaks enough of the resumable upload protocol
+  for ``videos().insert`` and can add latency, cap bandwidth and inject
+  errors.
+* :class:`MediaServer` serves clips over HTTP so yt-dlp's generic extractor
+  can "download" them; any ``/clips/<name>/<anything>.mp4`` path serves
+  ``<name>.mp4``, so every job can have a URL of its own.
+* :func:`make_clip` renders synthetic vertical H.264/AAC clips with ffmpeg.
+"""
+
+import http.server
+import json
+import os
+import random
+import re
+import subprocess
+import threading
+import time
+import urllib.parse
+import uuid
+
+from shorts_uploader.media import ffmpeg_binary
+
+def _throttled_read(stream, length, bandwidth, block_size=64 * 1024):
+    """Read ``length`` bytes from ``stream``, no faster than ``bandwidth`` bytes/s; yield blocks."""
+    started = time.monotonic()
+    done = 0
+    while done < length:
+        block = stream.read(min(block_size, length - done))
+        if not block:
+            return
+        done += len(block)
+        yield block
+        if bandwidth:
+            ahead = done / bandwidth - (time.monotonic() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+class _Server:
+    """A ThreadingHTTPServer on a free local port, run on a daemon thread."""
+
+    def __init__(self, handler):
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+class _YouTubeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode('utf-8') if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _drain(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        for _ in _throttled_read(self.rfile, length, None):
+            pass
+
+    def do_POST(self):
+        server = self.server.owner
+        self._drain()
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        if query.get("uploadType") != ["resumable"]:
+            self._reply(404, {"error": {"code": 404, "message": "only resumable uploads are faked"}})
+            return
+        time.sleep(server.latency)
+        session = uuid.uuid4().hex
+        with server.lock:
+            server.sessions[session] = 0
+        self._reply(200, headers={"Location": f"{server.url}/upload/session/{session}"})
+
+    def do_PUT(self):
+        server = self.server.owner
+        session = self.path.rsplit("/", 1)[-1]
+        with server.lock:
+            received = server.sessions.get(session)
+        if received is None:
+            self._drain()
+            self._reply(404, {"error": {"code": 404, "message": "unknown upload session"}})
+            return
+        time.sleep(server.latency)
+
+        length = int(self.headers.get("Content-Length") or 0)
+        match = re.match(r"bytes (\*|(\d+)-(\d+))/(\*|\d+)", self.headers.get("Content-Range", ""))
+        total = None if not match or match.group(4) == "*" else int(match.group(4))
+
+        fault = server.roll_fault() if length else None
+        offset = int(match.group(2)) if match and match.group(2) else received
+        # A dropped connection keeps half the chunk and never answers
+        for block in _throttled_read(self.rfile, length // 2 if fault == "drop" else length, server.bandwidth):
+            # Bytes the server already holds (a resent chunk) are not counted twice
+            end = offset + len(block)
+            if offset <= received < end:
+                received = end
+            offset = end
+        if fault == "drop":
+            with server.lock:
+                server.sessions[session] = received
+            self.close_connection = True
+            return
+        if fault == "503":
+            self._reply(503, {"error": {"code": 503, "message": "injected backend error"}})
+            return
+
+        with server.lock:
+            server.sessions[session] = received
+            server.bytes_received += length
+        if total is not None and received >= total:
+            with server.lock:
+                server.uploads += 1
+            self._reply(200, {"kind": "youtube#video", "id": f"fake-{session[:11]}"})
+        elif received:
+            self._reply(308, headers={"Range": f"bytes=0-{received - 1}"})
+        else:
+            self._reply(308)
+
+class FakeYouTubeServer(_Server):
+    """Fake resumable upload endpoint for ``videos().insert``.
+
+    ``latency`` seconds are added to every request, request bodies are read
+    at no more than ``bandwidth`` bytes/s (None for unlimited), and each
+    chunk fails with probability ``error_rate``: half of the failures answer
+    503, the other half drop the connection after half the chunk arrived.
+    """
+
+    def __init__(self, latency=0.0, bandwidth=None, error_rate=0.0, seed=0):
+        super().__init__(_YouTubeHandler)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.uploads = 0
+        self.bytes_received = 0
+        self.errors_injected = 0
+        self._random = random.Random(seed)
+
+    def roll_fault(self):
+        with self.lock:
+            if self._random.random() >= self.error_rate:
+                return None
+            self.errors_injected += 1
+            return self._random.choice(("503", "drop"))
+
+    def discovery_document(self, document):
+        """Return ``document`` (a discovery document string) pointed at this server."""
+        service = json.loads(document)
+        for key in ("rootUrl", "baseUrl", "mtlsRootUrl"):
+            service[key] = f"{self.url}/"
+        return json.dumps(service)
+
+class _MediaHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _clip_path(self):
+        match = re.match(r"/clips/([\w-]+)/[^/]+\.mp4$", urllib.parse.urlparse(self.path).path)
+        if not match:
+            return None
+        path = os.path.join(self.server.owner.directory, f"{match.group(1)}.mp4")
+        return path if os.path.isfile(path) else None
+
+    def _headers(self, path):
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+
+    def do_HEAD(self):
+        path = self._clip_path()
+        if path is None:
+            self.send_error(404)
+            return
+        self._headers(path)
+
+    def do_GET(self):
+        server = self.server.owner
+        path = self._clip_path()
+        if path is None:
+            self.send_error(404)
+            return
+        time.sleep(server.latency)
+        self._headers(path)
+        with open(path, "rb") as clip:
+            for block in _throttled_read(clip, os.path.getsize(path), server.bandwidth):
+                self.wfile.write(block)
+
+class MediaServer(_Server):
+    """Serve the clips in ``directory`` as ``/clips/<name>/<id>.mp4``."""
+
+    def __init__(self, directory, latency=0.0, bandwidth=None):
+        super().__init__(_MediaHandler)
+        self.directory = directory
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+def make_clip(path, seconds, width=720, height=1280, fps=30):
+    """Render a synthetic vertical H.264/AAC clip with a moving test pattern and a tone."""
+    subprocess.run(
+        [ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-y',
+         '-f', 'lavfi', '-i', f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}",
+         '-f', 'lavfi', '-i', f"sine=frequency=440:duration={seconds}",
+         '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+         '-c:a', 'aac', '-shortest', '-movflags', '+faststart', path],
+        check=True)
+    return path
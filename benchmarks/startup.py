@@ -0,0 +1,148 @@
+"""Startup-time benchmark.
+
+Measures, each in a fresh interpreter:
+
+* import time of the engine package and of the GUI module,
+* time-to-window: constructing the Tk app until its first frame is drawn,
+* time-to-first-job: interpreter start until the pipeline's first stage
+  (probe) receives a job.
+
+Run from the repository root::
+
+    python benchmarks/startup.py --runs 5 --max-import-ms 300
+
+With any ``--max-*`` limit given, the script exits non-zero when the median
+exceeds it, so it can gate CI. ``--importtime`` lists the slowest imports.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_ENGINE = """
+import time
+started = time.perf_counter()
+import shorts_uploader
+print((time.perf_counter() - started) * 1000)
+"""
+
+IMPORT_GUI = """
+import time
+started = time.perf_counter()
+import main
+print((time.perf_counter() - started) * 1000)
+"""
+
+TIME_TO_WINDOW = """
+import time
+started = time.perf_counter()
+import main
+app = main.YouTubeShortsAutoPost()
+app.root.update()
+print((time.perf_counter() - started) * 1000)
+app.root.destroy()
+"""
+
+TIME_TO_FIRST_JOB = """
+import time
+started = time.perf_counter()
+import threading
+from shorts_uploader import ShortsEngine
+
+class NullLogger:
+    def log(self, message, level="INFO"):
+        pass
+
+engine = ShortsEngine(NullLogger())
+first_job = threading.Event()
+
+def probe_stage(upload_data):
+    if not first_job.is_set():
+        print((time.perf_counter() - started) * 1000)
+        first_job.set()
+    # Drop the job so no later stage looks for the probe file
+    return None
+
+engine._probe_stage = probe_stage
+engine.run([{'url': 'startup-probe.mp4', 'source': 'Local File',
+             'title': 'probe', 'caption': '', 'privacy': 'private'}])
+"""
+
+def measure(code, runs, cwd):
+    """Run ``code`` ``runs`` times in fresh interpreters; return the samples in ms or an error.
+
+    Raises if a run succeeds without printing a sample, which means the
+    snippet no longer reaches the point it measures.
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+        lines = result.stdout.strip().splitlines()
+        if not lines:
+            raise Exception(
+                f"Benchmark run printed no timing; stderr:\n{result.stderr.strip() or '(empty)'}")
+        samples.append(float(lines[-1]))
+    return samples, None
+
+def slowest_imports(module, limit, cwd):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--max-import-ms", type=float, help="fail if importing the engine takes longer")
+    parser.add_argument("--max-window-ms", type=float, help="fail if time-to-window takes longer")
+    parser.add_argument("--max-first-job-ms", type=float, help="fail if time-to-first-job takes longer")
+    parser.add_argument("--importtime", action="store_true", help="list the slowest imports of the engine")
+    args = parser.parse_args(argv)
+
+    checks = [
+        ("import shorts_uploader", IMPORT_ENGINE, args.max_import_ms),
+        ("import main (GUI)", IMPORT_GUI, None),
+        ("time-to-window", TIME_TO_WINDOW, args.max_window_ms),
+        ("time-to-first-job", TIME_TO_FIRST_JOB, args.max_first_job_ms),
+    ]
+
+    failed = False
+    # The engine creates its cache and journal in the working directory
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, code, limit in checks:
+            samples, error = measure(code, args.runs, work_dir)
+            if samples is None:
+                print(f"{name:24} skipped ({error})")
+                continue
+            median = statistics.median(samples)
+            verdict = ""
+            if limit is not None and median > limit:
+                verdict = f"  SLOWER THAN {limit:.0f} ms"
+                failed = True
+            print(f"{name:24} median {median:8.1f} ms  min {min(samples):8.1f} ms{verdict}")
+
+        if args.importtime:
+            print("\nslowest imports (cumulative us):")
+            for cumulative, module in slowest_imports("shorts_uploader", 15, work_dir):
+                print(f"{cumulative:10d}  {module}")
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
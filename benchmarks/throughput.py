@@ -0,0 +1,247 @@
+"""Offline throughput benchmark.
+
+Runs batches through the real engine (probe, yt-dlp download, fingerprint,
+clean and resumable upload) against local stand-ins only:
+
+* synthetic vertical clips rendered with ffmpeg,
+* a local HTTP server yt-dlp's generic extractor downloads them from,
+* a fake YouTube resumable-upload endpoint, injected into the engine
+  through a discovery document whose root URL points at it.
+
+Each batch runs in a fresh interpreter and working directory, and the script
+reports per-stage and end-to-end videos/minute, CPU time and peak RSS. Run
+from the repository root::
+
+    python benchmarks/throughput.py --batch-sizes 10,100,1000 --upload-latency 0.05 \\
+        --upload-bandwidth 20 --error-rate 0.02
+
+``--json`` saves the results so runs before and after a pipeline change can
+be compared.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from fakes import FakeYouTubeServer, MediaServer, make_clip
+
+STAGES = ("probe", "download", "fingerprint", "clean", "upload")
+
+def run_batch(args):
+    """Run one batch in this process and print its measurements as JSON (child mode)."""
+    import resource
+    import threading
+    import time
+    from google.oauth2.credentials import Credentials
+
+    from shorts_uploader import ConsoleLogger, ShortsEngine
+    from shorts_uploader.channels import Channel
+    from shorts_uploader.quota import QuotaScheduler
+
+    class NullLogger:
+        def log(self, message, level="INFO"):
+            pass
+
+    engine = ShortsEngine(ConsoleLogger() if args.verbose else NullLogger())
+    engine.clean_mode = args.clean_mode
+    engine.dedupe = args.dedupe
+    engine.streaming = args.stream
+    # Measure the pipeline, not the quota policy
+    engine.quota = QuotaScheduler("state/quota.sqlite3", daily_quota=10 ** 12, uploads_per_hour=0)
+    for stage in engine.stage_workers:
+        workers = getattr(args, f"{stage}_workers", None)
+        if workers:
+            engine.stage_workers[stage] = workers
+
+    engine.discovery_document = args.discovery_document
+    channel = Channel("benchmark", "unused-token.json", "unused-secrets.json")
+    channel.credentials = Credentials(token="benchmark")
+    engine.channels = [channel]
+    engine.credentials = channel.credentials
+
+    busy = {stage: [] for stage in STAGES}
+
+    def timed(stage, func):
+        def wrapper(upload_data):
+            started = time.perf_counter()
+            try:
+                return func(upload_data)
+            finally:
+                busy[stage].append(time.perf_counter() - started)
+        return wrapper
+
+    for stage in STAGES:
+        setattr(engine, f"_{stage}_stage", timed(stage, getattr(engine, f"_{stage}_stage")))
+
+    clips = args.clips.split(",")
+    jobs = [
+        {
+            'url': f"{args.media_url}/clips/{clips[number % len(clips)]}/{number}.mp4",
+            'source': "Facebook",
+            'title': f"Benchmark {number}",
+            'caption': "",
+            'privacy': "private"
+        }
+        for number in range(args.batch_size)
+    ]
+
+    before_self = resource.getrusage(resource.RUSAGE_SELF)
+    before_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    engine.run(jobs)
+    wall = time.perf_counter() - started
+    after_self = resource.getrusage(resource.RUSAGE_SELF)
+    after_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    def cpu(before, after):
+        return (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+
+    workers = dict(engine.stage_workers)
+    workers['clean'] = max(workers['clean'], engine._transcode_plan()[0])
+    stages = {}
+    for stage, samples in busy.items():
+        if not samples:
+            continue
+        total = sum(samples)
+        stages[stage] = {
+            'items': len(samples),
+            'seconds_per_item': total / len(samples),
+            'workers': workers[stage],
+            # What the stage could sustain on its own with its worker count
+            'videos_per_minute': len(samples) / (total / workers[stage]) * 60 if total else None
+        }
+
+    print(json.dumps({
+        'batch_size': args.batch_size,
+        'wall_seconds': wall,
+        'cpu_seconds': cpu(before_self, after_self),
+        'children_cpu_seconds': cpu(before_children, after_children),
+        'peak_rss_mb': after_self.ru_maxrss / 1024,
+        'children_peak_rss_mb': after_children.ru_maxrss / 1024,
+        'threads': threading.active_count(),
+        'stages': stages
+    }))
+    return 0
+
+def child_command(args, batch_size, media_url, discovery_file):
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child",
+        "--batch-size", str(batch_size),
+        "--media-url", media_url,
+        "--discovery-file", discovery_file,
+        "--clips", args.clips,
+        "--clean-mode", args.clean_mode,
+    ]
+    for flag in ("dedupe", "stream", "verbose"):
+        if getattr(args, flag):
+            command.append(f"--{flag}")
+    for stage in STAGES:
+        workers = getattr(args, f"{stage}_workers")
+        if workers:
+            command += [f"--{stage}-workers", str(workers)]
+    return command
+
+def print_report(result):
+    print(f"\nbatch of {result['batch_size']}: {result['uploaded']} uploaded in {result['wall_seconds']:.1f} s "
+          f"= {result['videos_per_minute']:.1f} videos/min end to end, "
+          f"{result['upload_errors_injected']} upload errors injected")
+    print(f"  cpu {result['cpu_seconds']:.1f} s engine + {result['children_cpu_seconds']:.1f} s ffmpeg/pool, "
+          f"peak rss {result['peak_rss_mb']:.0f} MB engine / {result['children_peak_rss_mb']:.0f} MB largest child")
+    print(f"  {'stage':12} {'items':>6} {'s/item':>8} {'workers':>8} {'videos/min':>11}")
+    for stage in STAGES:
+        row = result['stages'].get(stage)
+        if row:
+            rate = f"{row['videos_per_minute']:.1f}" if row['videos_per_minute'] else "-"
+            print(f"  {stage:12} {row['items']:6d} {row['seconds_per_item']:8.3f} {row['workers']:8d} {rate:>11}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--batch-sizes", default="10,100", help="comma-separated batch sizes to run")
+    parser.add_argument("--clip-seconds", default="5,15,45",
+                        help="lengths of the synthetic clips; jobs cycle through them")
+    parser.add_argument("--upload-latency", type=float, default=0.0, help="seconds added to every upload request")
+    parser.add_argument("--upload-bandwidth", type=float, help="upload bandwidth cap in MB/s")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of upload chunks answered with 503 or a dropped connection")
+    parser.add_argument("--download-latency", type=float, default=0.0, help="seconds before each clip download starts")
+    parser.add_argument("--download-bandwidth", type=float, help="download bandwidth cap in MB/s")
+    parser.add_argument("--clean-mode", default="auto", choices=("auto", "reencode"))
+    parser.add_argument("--dedupe", action="store_true",
+                        help="keep duplicate detection on (jobs reuse a few clips, so most get skipped)")
+    parser.add_argument("--stream", action="store_true", help="use the zero-temp-file streaming upload")
+    for stage in STAGES:
+        parser.add_argument(f"--{stage}-workers", type=int, help=f"worker threads for the {stage} stage")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the engine's log")
+    # Internal: run a single batch in this interpreter
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--batch-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--media-url", help=argparse.SUPPRESS)
+    parser.add_argument("--discovery-file", help=argparse.SUPPRESS)
+    parser.add_argument("--clips", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        with open(args.discovery_file, encoding='utf-8') as document:
+            args.discovery_document = document.read()
+        return run_batch(args)
+
+    from googleapiclient.discovery_cache import get_static_doc
+
+    mb = 1024 * 1024
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        clip_dir = os.path.join(scratch, "clips")
+        os.makedirs(clip_dir)
+        clips = []
+        for seconds in args.clip_seconds.split(","):
+            name = f"clip-{seconds}s"
+            make_clip(os.path.join(clip_dir, f"{name}.mp4"), float(seconds))
+            clips.append(name)
+        args.clips = ",".join(clips)
+
+        youtube = FakeYouTubeServer(
+            latency=args.upload_latency,
+            bandwidth=args.upload_bandwidth * mb if args.upload_bandwidth else None,
+            error_rate=args.error_rate)
+        media = MediaServer(
+            clip_dir, latency=args.download_latency,
+            bandwidth=args.download_bandwidth * mb if args.download_bandwidth else None)
+        with youtube, media:
+            discovery_file = os.path.join(scratch, "discovery.json")
+            with open(discovery_file, "w", encoding='utf-8') as document:
+                document.write(youtube.discovery_document(get_static_doc("youtube", "v3")))
+
+            for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+                # Fresh working directory: empty journal, cache and fingerprint index
+                work_dir = os.path.join(scratch, f"batch-{batch_size}")
+                os.makedirs(work_dir)
+                uploads_before, errors_before = youtube.uploads, youtube.errors_injected
+                env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+                result = subprocess.run(
+                    child_command(args, batch_size, media.url, discovery_file),
+                    cwd=work_dir, env=env, stdout=subprocess.PIPE, text=True)
+                if result.returncode != 0:
+                    print(f"batch of {batch_size} failed", file=sys.stderr)
+                    return 1
+                report = json.loads(result.stdout.strip().splitlines()[-1])
+                # The fake server counts what actually arrived, duplicates and failures excluded
+                report['uploaded'] = youtube.uploads - uploads_before
+                report['videos_per_minute'] = report['uploaded'] / report['wall_seconds'] * 60
+                report['upload_errors_injected'] = youtube.errors_injected - errors_before
+                print_report(report)
+                results.append(report)
+
+    if args.json:
+        with open(args.json, "w", encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,14 @@
 import os
 import sys
+import queue
+import threading
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext
-import ttkthemes
-from PIL import Image, ImageTk
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-import yt_dlp
-from moviepy.editor import VideoFileClip
-import re
-import json
 import sv_ttk
-import queue
-import threading
-import uuid
-import unicodedata
+
+from shorts_uploader import FolderWatcher, ShortsEngine
+from shorts_uploader.manifest import read_manifest
 
 class CustomTooltip:
     def __init__(self, widget, text):
@@ -47,82 +38,188 @@ class CustomTooltip:
             self.tooltip = None
 
 class Logger:
-    def __init__(self, text_widget):
+    """Thread-safe activity log for the Tk text widget.
+
+    ``log`` may be called from any thread; it only appends the record to a
+    queue. The Tk thread drains that queue every ``interval_ms`` and writes
+    the whole batch with a single insert, then trims the widget so it keeps
+    just the last ``max_lines`` lines.
+    """
+
+    def __init__(self, text_widget, interval_ms=100, max_lines=2000):
         self.text_widget = text_widget
+        self.interval_ms = interval_ms
+        self.max_lines = max_lines
+        self.records = queue.SimpleQueue()
+        self.text_widget.after(self.interval_ms, self._drain)
 
     def log(self, message, level="INFO"):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        level_colors = {
-            "INFO": "#4CAF50",
-            "ERROR": "#FF5252",
-            "WARNING": "#FFB74D",
-            "SUCCESS": "#66BB6A"
-        }
+        self.records.put((timestamp, level, message))
+
+    def _drain(self):
+        batch = []
+        try:
+            while True:
+                batch.append(self.records.get_nowait())
+        except queue.Empty:
+            pass
         
-        self.text_widget.configure(state='normal')
-        self.text_widget.insert(tk.END, f"[{timestamp}] ", "timestamp")
-        self.text_widget.insert(tk.END, f"[{level}] ", f"level_{level.lower()}")
-        self.text_widget.insert(tk.END, f"{message}\n", "message")
+        if batch:
+            # Records that would be trimmed right away are never inserted
+            chunks = []
+            for timestamp, level, message in batch[-self.max_lines:]:
+                chunks += [
+                    f"[{timestamp}] ", "timestamp",
+                    f"[{level}] ", f"level_{level.lower()}",
+                    f"{message}\n", "message"
+                ]
+            
+            self.text_widget.configure(state='normal')
+            self.text_widget.insert(tk.END, *chunks)
+            lines = int(self.text_widget.index('end-1c').split('.')[0]) - 1
+            if lines > self.max_lines:
+                self.text_widget.delete('1.0', f'{lines - self.max_lines + 1}.0')
+            
+            self.text_widget.see(tk.END)
+            self.text_widget.configure(state='disabled')
+        
+        self.text_widget.after(self.interval_ms, self._drain)
+
+class JobTable:
+    """Per-job stage, progress, speed and ETA, rendering only the rows in view.
+
+    The Treeview holds one item per visible line rather than one per job:
+    job state is kept in ``jobs`` and scrolling rewrites those few items
+    with the jobs at the new offset. Updates come from the engine's
+    ProgressBus, drained ``refresh_hz`` times a second, so a tick costs the
+    Tk thread the jobs that changed plus the rows in view, however many jobs
+    are queued and however often they report. Selected jobs are tracked by
+    key, so the selection follows them as the view scrolls.
+    """
+
+    COLUMNS = (
+        ('job', "Job", 200, 'w'),
+        ('stage', "Stage", 80, 'w'),
+        ('download', "Download", 70, 'e'),
+        ('upload', "Upload", 70, 'e'),
+        ('speed', "Speed", 80, 'e'),
+        ('eta', "ETA", 60, 'e')
+    )
+
+    def __init__(self, parent, rows=10, refresh_hz=4):
+        self.frame = ttk.Frame(parent)
+        self.rows = rows
+        self.interval_ms = max(1, int(1000 / refresh_hz))
+        self.bus = None
+        self.jobs = {}
+        self.order = []
+        self.top = 0
+        self.selected = set()
+        
+        self.tree = ttk.Treeview(
+            self.frame,
+            columns=[name for name, _, _, _ in self.COLUMNS],
+            show='headings',
+            height=rows,
+            selectmode='extended'
+        )
+        for name, heading, width, anchor in self.COLUMNS:
+            self.tree.heading(name, text=heading)
+            self.tree.column(name, width=width, anchor=anchor, stretch=(name == 'job'))
+        self.items = [self.tree.insert('', tk.END, values=()) for _ in range(rows)]
+        self.shown = [()] * rows
         
-        self.text_widget.see(tk.END)
-        self.text_widget.configure(state='disabled')
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar.set(0, 1)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+
+    def selection(self):
+        """Return the keys of the selected jobs, in table order."""
+        return [key for key in self.order if key in self.selected]
+
+    def start(self, bus):
+        """Subscribe to ``bus`` and start refreshing from it."""
+        self.bus = bus
+        bus.subscribe()
+        self.tree.after(self.interval_ms, self._drain)
+
+    def _drain(self):
+        changed = self.bus.drain()
+        for key, fields in changed.items():
+            job = self.jobs.get(key)
+            if job is None:
+                job = self.jobs[key] = {}
+                self.order.append(key)
+            job.update(fields)
+        if changed:
+            self._render()
+        self.tree.after(self.interval_ms, self._drain)
+
+    def _render(self):
+        total = len(self.order)
+        self.top = max(0, min(self.top, total - self.rows))
+        keys = self.order[self.top:self.top + self.rows]
+        for index, item in enumerate(self.items):
+            values = self._values(self.jobs[keys[index]]) if index < len(keys) else ()
+            # Unchanged rows are not touched, so idle jobs cost nothing
+            if values != self.shown[index]:
+                self.tree.item(item, values=values)
+                self.shown[index] = values
+        selected = [item for item, key in zip(self.items, keys) if key in self.selected]
+        if list(self.tree.selection()) != selected:
+            self.tree.selection_set(selected)
+        if total > self.rows:
+            self.scrollbar.set(self.top / total, (self.top + self.rows) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _values(self, job):
+        speed = job.get('speed')
+        eta = job.get('eta')
+        return (
+            job.get('title') or job.get('url') or "",
+            job.get('stage') or "",
+            self._percent(job.get('download')),
+            self._percent(job.get('upload')),
+            f"{speed / (1024 * 1024):.1f} MB/s" if speed else "",
+            f"{int(eta) // 60}:{int(eta) % 60:02d}" if eta is not None else ""
+        )
+
+    def _percent(self, value):
+        return f"{value:.0f}%" if value is not None else ""
+
+    def _on_select(self, event=None):
+        keys = self.order[self.top:self.top + self.rows]
+        chosen = {keys[self.items.index(item)] for item in self.tree.selection()
+                  if self.items.index(item) < len(keys)}
+        # Selected jobs scrolled out of view stay selected
+        self.selected = (self.selected - set(keys)) | chosen
+
+    def _on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.order))
+        else:
+            self.top += int(amount) * (self.rows if unit == "pages" else 1)
+        self._render()
+
+    def _on_mousewheel(self, event):
+        self._on_scroll("scroll", int(-1*(event.delta/120)), "units")
+        # Keep the window canvas from scrolling along
+        return "break"
 
 class YouTubeShortsAutoPost:
     def __init__(self):
-        self.upload_queue = queue.Queue()
-        self.is_processing = False
-        
-        self.SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
-        self.api_service_name = "youtube"
-        self.api_version = "v3"
-        self.client_secrets_file = "client_secrets.json"
-        self.credentials = None
-        self.youtube = None
-        
-        # Basic yt-dlp options
-        self.ydl_opts = {
-            'format': 'best',
-            'outtmpl': 'downloads/%(id)s.%(ext)s',
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-            },
-        }
-        
-        # Initialize platform-specific options
-        self.platform_opts = {
-            'TikTok': {
-                'format': 'best',
-                'force_generic_extractor': False,
-                'extractor_args': {
-                    'tiktok': {
-                        'embed_url': None,
-                        'api_hostname': 'api16-normal-c-useast1a.tiktokv.com',
-                        'app_version': '1.0.0',
-                        'manifest_app_version': '1.0.0'
-                    }
-                }
-            },
-            'Instagram': {
-                'format': 'best',
-                'force_generic_extractor': False,
-                'extract_flat': True
-            },
-            'Facebook': {
-                'format': 'best',
-                'force_generic_extractor': False,
-                'extract_flat': True
-            }
-        }
-        
         self.setup_gui()
+        self.engine = ShortsEngine(self.logger, on_idle=self._on_engine_idle)
+        self.job_table.start(self.engine.progress)
+        self.watcher = None
+        if self.engine.has_saved_credentials():
+            # Reconnect with the saved login in the background; no browser
+            threading.Thread(target=self._restore_login, daemon=True).start()
         
     def setup_gui(self):
         self.root = tk.Tk()
@@ -264,7 +361,7 @@ class YouTubeShortsAutoPost:
         
         url_label = ttk.Label(
             url_frame,
-            text="Video URLs (one per line)",
+            text="Video, profile or playlist URLs (one per line)",
             font=self.header_font
         )
         url_label.pack(anchor='w')
@@ -276,15 +373,72 @@ class YouTubeShortsAutoPost:
             wrap=tk.WORD
         )
         self.url_text.pack(fill=tk.X, pady=(5, 0))
-        CustomTooltip(self.url_text, "Enter multiple URLs, one per line")
+        CustomTooltip(self.url_text, "Enter multiple URLs, one per line. Profile, hashtag and playlist URLs add each of their posts")
+        
+        url_buttons = ttk.Frame(url_frame)
+        url_buttons.pack(anchor='e', pady=(5, 0))
         
         browse_btn = ttk.Button(
-            url_frame,
+            url_buttons,
             text="Browse Files",
             command=self.browse_files,
             style='Accent.TButton'
         )
-        browse_btn.pack(anchor='e', pady=(5, 0))
+        browse_btn.pack(side=tk.RIGHT)
+        
+        self.watch_btn = ttk.Button(
+            url_buttons,
+            text="Watch Folder",
+            command=self.toggle_watch
+        )
+        self.watch_btn.pack(side=tk.RIGHT, padx=(0, 10))
+        
+        self.import_btn = ttk.Button(
+            url_buttons,
+            text="Import Manifest",
+            command=self.import_manifest
+        )
+        self.import_btn.pack(side=tk.RIGHT, padx=(0, 10))
+        CustomTooltip(self.import_btn, "Upload a JSONL or CSV manifest with a title, description, tags and privacy per video")
+        CustomTooltip(self.watch_btn, "Upload every video copied into a folder. Use {name} in the title for the file name")
+
+        # Profile/playlist expansion limits
+        listing_frame = ttk.Frame(upload_frame)
+        listing_frame.pack(fill=tk.X, pady=10)
+        
+        max_items_label = ttk.Label(
+            listing_frame,
+            text="Max posts per profile",
+            font=self.header_font
+        )
+        max_items_label.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.max_items_var = tk.StringVar(value="0")
+        max_items = ttk.Spinbox(
+            listing_frame,
+            from_=0,
+            to=10000,
+            width=6,
+            textvariable=self.max_items_var,
+            font=self.text_font
+        )
+        max_items.pack(side=tk.LEFT)
+        CustomTooltip(max_items, "Posts to take from each profile, hashtag or playlist URL (0 = all)")
+        
+        since_label = ttk.Label(
+            listing_frame,
+            text="Posted since",
+            font=self.header_font
+        )
+        since_label.pack(side=tk.LEFT, padx=(20, 10))
+        
+        self.since_entry = ttk.Entry(
+            listing_frame,
+            width=12,
+            font=self.text_font
+        )
+        self.since_entry.pack(side=tk.LEFT)
+        CustomTooltip(self.since_entry, "Skip profile posts from before this date (YYYY-MM-DD, empty = any date)")
 
         # Title Input
         title_frame = ttk.Frame(upload_frame)
@@ -337,15 +491,59 @@ class YouTubeShortsAutoPost:
         return left_frame
 
     def create_right_panel(self, parent):
-        right_frame = ttk.LabelFrame(
-            parent,
+        right_frame = ttk.Frame(parent)
+        
+        jobs_frame = ttk.LabelFrame(
+            right_frame,
+            text="Jobs",
+            padding=15
+        )
+        jobs_frame.pack(fill=tk.X, pady=(0, 15))
+        
+        self.job_table = JobTable(jobs_frame)
+        self.job_table.frame.pack(fill=tk.X)
+        
+        job_buttons = ttk.Frame(jobs_frame)
+        job_buttons.pack(anchor='e', pady=(10, 0))
+        
+        cancel_btn = ttk.Button(
+            job_buttons,
+            text="Cancel",
+            command=self.cancel_selected
+        )
+        cancel_btn.pack(side=tk.RIGHT)
+        CustomTooltip(cancel_btn, "Stop the selected jobs and delete their temporary files")
+        
+        top_btn = ttk.Button(
+            job_buttons,
+            text="Move to Top",
+            command=self.prioritize_selected
+        )
+        top_btn.pack(side=tk.RIGHT, padx=(0, 10))
+        CustomTooltip(top_btn, "Run the selected jobs ahead of everything else waiting")
+        
+        self.pause_buttons = {}
+        for stage, text in (('upload', "Uploads"), ('download', "Downloads")):
+            button = ttk.Button(
+                job_buttons,
+                text=f"Pause {text}",
+                command=lambda stage=stage, text=text: self.toggle_pause(stage, text)
+            )
+            button.pack(side=tk.RIGHT, padx=(0, 10))
+            self.pause_buttons[stage] = button
+        CustomTooltip(self.pause_buttons['upload'], "Hold uploads after their current chunk, e.g. to free bandwidth")
+        CustomTooltip(self.pause_buttons['download'], "Hold downloads after their current fragment")
+        
+        log_frame = ttk.LabelFrame(
+            right_frame,
             text="Activity Log",
             padding=15
         )
+        log_frame.pack(fill=tk.BOTH, expand=True)
         
         self.log_text = scrolledtext.ScrolledText(
-            right_frame,
-            height=30,
+            log_frame,
+            height=18,
             font=('Consolas', 10),
             wrap=tk.WORD
         )
@@ -370,9 +568,85 @@ class YouTubeShortsAutoPost:
             self.url_text.delete("1.0", tk.END)
             self.url_text.insert("1.0", "\n".join(filenames))
 
+    def import_manifest(self):
+        """Upload every job of a JSONL or CSV manifest, read from disk as the batch runs."""
+        if not self.engine.youtube:
+            self.logger.log("Please login to YouTube first", "ERROR")
+            return
+        path = filedialog.askopenfilename(
+            filetypes=[("Manifests", "*.jsonl *.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        
+        # The fields fill in what manifest lines leave out; read them here,
+        # on the Tk thread, since the manifest is read on the worker thread
+        defaults = {
+            'source': self.source_var.get() or None,
+            'title': self.title_entry.get() or "Short {number}",
+            'caption': self.caption_text.get("1.0", tk.END).strip(),
+            'privacy': self.privacy_var.get()
+        }
+        self.logger.log(f"Importing manifest {os.path.basename(path)}...", "INFO")
+        if not self._start_processing(read_manifest(path, defaults, self.logger)):
+            self.logger.log("Wait for the current batch to finish before importing a manifest", "WARNING")
+
+    def toggle_watch(self):
+        """Start or stop uploading every video dropped into a folder."""
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+            self.watch_btn.configure(text="Watch Folder")
+            return
+        
+        if not self.engine.youtube:
+            self.logger.log("Please login to YouTube first", "ERROR")
+            return
+        directory = filedialog.askdirectory()
+        if not directory:
+            return
+        
+        self.watcher = FolderWatcher(self.engine, directory, {
+            'title': self.title_entry.get() or "{name}",
+            'caption': self.caption_text.get("1.0", tk.END).strip(),
+            'privacy': self.privacy_var.get()
+        })
+        threading.Thread(target=self._run_watcher, args=(self.watcher,), daemon=True).start()
+        self.watch_btn.configure(text="Stop Watching")
+
+    def _run_watcher(self, watcher):
+        try:
+            watcher.run()
+        except Exception as e:
+            self.logger.log(f"Watch folder stopped: {str(e)}", "ERROR")
+            self.root.after(0, self._on_watch_failed, watcher)
+
+    def _on_watch_failed(self, watcher):
+        if self.watcher is watcher:
+            self.watcher = None
+            self.watch_btn.configure(text="Watch Folder")
+
+    def cancel_selected(self):
+        for key in self.job_table.selection():
+            self.engine.cancel(key)
+
+    def prioritize_selected(self):
+        # Last first, so the selection keeps its order at the top
+        for key in reversed(self.job_table.selection()):
+            self.engine.reprioritize(key)
+
+    def toggle_pause(self, stage, text):
+        if self.engine.is_paused(stage):
+            self.engine.resume(stage)
+            self.pause_buttons[stage].configure(text=f"Pause {text}")
+            self.logger.log(f"{text} resumed", "INFO")
+        else:
+            self.engine.pause(stage)
+            self.pause_buttons[stage].configure(text=f"Resume {text}")
+            self.logger.log(f"{text} paused", "WARNING")
+
     def start_batch_upload(self):
         """Initialize the batch upload process."""
-        if not self.youtube:
+        if not self.engine.youtube:
             self.logger.log("Please login to YouTube first", "ERROR")
             return
             
@@ -388,242 +662,70 @@ class YouTubeShortsAutoPost:
             self.logger.log("Please provide at least one URL or file", "ERROR")
             return
             
-        self.logger.log(f"Processing {len(urls)} videos for upload...", "INFO")
-        
-        # Clear the queue while ensuring thread safety
-        with self.upload_queue.mutex:
-            self.upload_queue.queue.clear()
-            
-        # Add all URLs to the queue
-        for i, url in enumerate(urls, 1):
-            title_template = self.title_entry.get() or "Short {number}"
-            title = title_template.replace("{number}", str(i))
+        try:
+            max_items = int(self.max_items_var.get() or 0)
+            since = self.since_entry.get().strip()
+            if since:
+                datetime.strptime(since, "%Y-%m-%d")
+        except ValueError:
+            self.logger.log("Max posts must be a number and the date must look like 2024-01-31", "ERROR")
+            return
             
-            self.upload_queue.put({
+        self.logger.log(f"Processing {len(urls)} URLs for upload...", "INFO")
+        title_template = self.title_entry.get() or "Short {number}"
+        caption = self.caption_text.get("1.0", tk.END).strip()
+        privacy = self.privacy_var.get()
+        
+        # Add all URLs to the queue; the engine numbers the titles as it
+        # expands profile and playlist URLs into their posts
+        for url in urls:
+            upload_data = {
                 'url': url,
                 'source': source,
-                'title': title,
-                'caption': self.caption_text.get("1.0", tk.END).strip(),
-                'privacy': self.privacy_var.get()
-            })
-            
-        # Start processing if not already running
-        if not self.is_processing:
-            self.is_processing = True
-            self.upload_btn.configure(state='disabled')
-            threading.Thread(target=self.process_queue, daemon=True).start()
-
-    def process_queue(self):
-        """Process the upload queue."""
-        try:
-            while not self.upload_queue.empty():
-                upload_data = self.upload_queue.get()
-                
-                try:
-                    self.logger.log(f"Processing: {upload_data['url']}")
-                    
-                    # Download video
-                    video_file = self.download_video(upload_data['url'], upload_data['source'])
-                    
-                    # Clean metadata if not local file
-                    if upload_data['source'] != "Local File":
-                        video_file = self.clean_metadata(video_file)
-                    
-                    # Upload to YouTube
-                    video_id = self.upload_to_youtube(
-                        video_file,
-                        upload_data['title'],
-                        upload_data['caption'],
-                        upload_data['privacy']
-                    )
-                    
-                    self.logger.log(f"✅ Upload successful! Video ID: {video_id}", "SUCCESS")
-                    
-                    # Clean up downloaded file if it's not a local file
-                    if upload_data['source'] != "Local File" and os.path.exists(video_file):
-                        os.remove(video_file)
-                        
-                except Exception as e:
-                    self.logger.log(f"❌ Error processing {upload_data['url']}: {str(e)}", "ERROR")
-                    
-                self.upload_queue.task_done()
-                
-        finally:
-            self.is_processing = False
-            self.root.after(0, lambda: self.upload_btn.configure(state='normal'))
-            self.logger.log("Batch upload process completed", "SUCCESS")
-
-    def upload_to_youtube(self, video_file, title, caption, privacy_status):
-        """Upload video to YouTube as a Short."""
-        try:
-            self.logger.log("Preparing upload to YouTube...")
-            
-            body = {
-                'snippet': {
-                    'title': title or f"Short - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                    'description': caption,
-                    'tags': ['Short'],
-                    'categoryId': '22'
-                },
-                'status': {
-                    'privacyStatus': privacy_status,
-                    'selfDeclaredMadeForKids': False
-                }
+                'title': title_template,
+                'caption': caption,
+                'privacy': privacy
             }
+            if max_items:
+                upload_data['max_items'] = max_items
+            if since:
+                upload_data['since'] = since
+            self.engine.upload_queue.put(upload_data)
             
-            media = MediaFileUpload(
-                video_file,
-                mimetype='video/*',
-                resumable=True
-            )
-            
-            self.logger.log("Uploading video...")
-            
-            request = self.youtube.videos().insert(
-                part=','.join(body.keys()),
-                body=body,
-                media_body=media
-            )
-            
-            response = request.execute()
-            self.logger.log("Upload completed successfully!", "SUCCESS")
-            return response['id']
-            
-        except Exception as e:
-            self.logger.log(f"Upload failed: {str(e)}", "ERROR")
-            raise
+        self._start_processing()
 
-    def clean_metadata(self, video_path):
-        """Remove metadata from video file with improved filename handling."""
-        try:
-            self.logger.log("Cleaning video metadata...")
-            
-            clean_filename = os.path.join(
-                os.path.dirname(video_path),
-                f"clean_{str(uuid.uuid4())}{os.path.splitext(video_path)[1]}"
-            )
-            
-            video = VideoFileClip(video_path)
-            
-            video.write_videofile(
-                clean_filename,
-                codec='libx264',
-                audio_codec='aac',
-                temp_audiofile=f'temp-{uuid.uuid4()}.m4a',
-                remove_temp=True
-            )
-            
-            video.close()
-            
-            if os.path.exists(video_path):
-                os.remove(video_path)
-            os.rename(clean_filename, video_path)
-            
-            self.logger.log("Metadata cleaning completed")
-            return video_path
-            
-        except Exception as e:
-            self.logger.log(f"Error cleaning metadata: {str(e)}", "ERROR")
-            raise
-    
-    def clean_title(self, title):
-        """Remove hashtags and clean title."""
-        title = re.sub(r'#\w+', '', title)
-        title = re.sub(r'\s+', ' ', title)
-        title = title.strip()
-        return title
-    
-    def sanitize_filename(self, filename):
-        """Sanitize filename by removing invalid characters and limiting length."""
-        filename = "".join(char for char in filename if char.isalnum() or char in (' ', '-', '_', '.'))
-        filename = unicodedata.normalize('NFKD', filename).encode('ASCII', 'ignore').decode('ASCII')
-        if len(filename) > 200:
-            name, ext = os.path.splitext(filename)
-            filename = name[:196] + ext
-        return filename
-
-    def get_safe_filename(self, base_path):
-        """Generate a safe, unique filename."""
-        name, ext = os.path.splitext(base_path)
-        counter = 1
-        while os.path.exists(base_path):
-            base_path = f"{name}_{counter}{ext}"
-            counter += 1
-        return base_path
-
-    def download_video(self, url, source):
-        """Download video from various sources with improved error handling."""
+    def _start_processing(self, jobs=None):
+        if not self.engine.start_processing(jobs):
+            return False
+        self._set_busy(True)
+        return True
+
+    def _set_busy(self, busy):
+        state = 'disabled' if busy else 'normal'
+        self.upload_btn.configure(state=state)
+        self.import_btn.configure(state=state)
+
+    def _on_engine_idle(self):
+        self.root.after(0, self._set_busy, False)
+
+    def _restore_login(self):
         try:
-            if source == "Local File":
-                self.logger.log("Using local file...")
-                return url
-            
-            self.logger.log(f"Downloading video from {source}...")
-            
-            # Create downloads directory if it doesn't exist
-            os.makedirs("downloads", exist_ok=True)
-            
-            # Combine default options with platform-specific options
-            current_opts = self.ydl_opts.copy()
-            if source in self.platform_opts:
-                current_opts.update(self.platform_opts[source])
-            
-            # Generate a unique filename
-            unique_id = str(uuid.uuid4())
-            output_template = f'downloads/{unique_id}.%(ext)s'
-            current_opts['outtmpl'] = output_template
-
-            try:
-                with yt_dlp.YoutubeDL(current_opts) as ydl:
-                    # Try to extract info first
-                    try:
-                        info_dict = ydl.extract_info(url, download=False)
-                        if info_dict is None:
-                            raise Exception("Could not extract video info")
-                    except Exception as e:
-                        self.logger.log(f"Info extraction failed, attempting direct download: {str(e)}", "WARNING")
-                        info_dict = {'id': unique_id}
-
-                    # Update output template with video ID if available
-                    video_id = info_dict.get('id', unique_id)
-                    current_opts['outtmpl'] = f'downloads/{video_id}.%(ext)s'
-                    
-                    # Perform the actual download
-                    with yt_dlp.YoutubeDL(current_opts) as ydl_download:
-                        info = ydl_download.download([url])
-                    
-                    # Find the downloaded file
-                    downloads_dir = "downloads"
-                    downloaded_files = [f for f in os.listdir(downloads_dir) 
-                                     if f.startswith(video_id) and os.path.isfile(os.path.join(downloads_dir, f))]
-                    
-                    if not downloaded_files:
-                        raise Exception("Download completed but file not found")
-                    
-                    video_path = os.path.join(downloads_dir, downloaded_files[0])
-                    self.logger.log(f"Download completed: {video_path}")
-                    return video_path
-
-            except Exception as e:
-                raise Exception(f"Download failed: {str(e)}")
-                
+            self.engine.authenticate(interactive=False)
         except Exception as e:
-            self.logger.log(f"Download failed: {str(e)}", "ERROR")
-            raise
-    
+            self.logger.log(f"Saved login could not be restored: {str(e)}", "WARNING")
+            return
+        self.root.after(0, self._on_login)
+
+    def _on_login(self):
+        self.login_button.configure(state='disabled')
+        if self.engine.resume_unfinished_jobs():
+            self._set_busy(True)
+
     def authenticate(self):
         """Authenticate with YouTube API."""
         try:
-            self.logger.log("Starting YouTube authentication...")
-            
-            flow = InstalledAppFlow.from_client_secrets_file(
-                self.client_secrets_file, self.SCOPES)
-            self.credentials = flow.run_local_server(port=0)
-            self.youtube = build(
-                self.api_service_name, self.api_version, credentials=self.credentials)
-            
-            self.logger.log("Authentication successful!", "SUCCESS")
-            self.login_button.configure(state='disabled')
+            self.engine.authenticate()
+            self._on_login()
             
         except Exception as e:
             self.logger.log(f"Authentication failed: {str(e)}", "ERROR")
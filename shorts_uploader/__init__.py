@@ -0,0 +1,12 @@
+"""Core download, clean and upload engine for YouTube Shorts.
+
+The Tk app in ``main.py`` and the command line (``python -m shorts_uploader``)
+are both thin clients of :class:`ShortsEngine`.
+"""
+
+from .engine import ShortsEngine
+from .logs import ConsoleLogger, JsonLinesLogger, TeeLogger
+from .pipeline import StagePipeline
+from .watch import FolderWatcher
+
+__all__ = ["ConsoleLogger", "FolderWatcher", "JsonLinesLogger", "ShortsEngine", "StagePipeline", "TeeLogger"]
@@ -0,0 +1,94 @@
+"""Persistent cache of cleaned downloads."""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+def link_or_copy(source_path, target_path):
+    """Hard-link ``source_path`` to ``target_path``, copying across filesystems."""
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copy2(source_path, target_path)
+
+class DownloadCache:
+    """Persistent store of cleaned downloads with an SQLite index.
+
+    Entries are keyed by platform and extractor video id. The index tracks
+    each file's size and last use, and least-recently-used entries are
+    evicted whenever the store grows past ``budget_bytes``.
+    """
+
+    def __init__(self, directory="cache", budget_bytes=5 * 1024 ** 3):
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, filename TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._db.commit()
+
+    def fetch(self, key, target_dir):
+        """Materialize the entry for ``key`` in ``target_dir`` and return its path, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT filename FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            object_path = self._object_path(row[0])
+            if not os.path.exists(object_path):
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute(
+                "UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            
+            target_path = os.path.join(
+                target_dir, f"cached_{uuid.uuid4()}{os.path.splitext(row[0])[1]}")
+            link_or_copy(object_path, target_path)
+            return target_path
+
+    def store(self, key, video_path):
+        """Add ``video_path`` to the cache under ``key`` and evict down to the budget."""
+        filename = hashlib.sha256(key.encode('utf-8')).hexdigest() + os.path.splitext(video_path)[1]
+        object_path = self._object_path(filename)
+        partial_path = f"{object_path}.{uuid.uuid4()}.part"
+        link_or_copy(video_path, partial_path)
+        os.replace(partial_path, object_path)
+        
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, filename, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, filename, os.path.getsize(object_path), time.time()))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        while total > self.budget_bytes:
+            row = self._db.execute(
+                "SELECT key, filename, size FROM entries ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            key, filename, size = row
+            try:
+                os.remove(self._object_path(filename))
+            except FileNotFoundError:
+                pass
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+    def _object_path(self, filename):
+        return os.path.join(self.directory, "objects", filename)
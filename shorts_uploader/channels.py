@@ -0,0 +1,94 @@
+"""YouTube channels (OAuth accounts) the engine can upload to."""
+
+import json
+import os
+import uuid
+
+class Channel:
+    """One authorized YouTube account and the files its login lives in."""
+
+    def __init__(self, name, token_file, client_secrets_file):
+        self.name = name
+        self.token_file = token_file
+        self.client_secrets_file = client_secrets_file
+        self.credentials = None
+
+    @property
+    def project(self):
+        """The API project whose quota this channel's uploads spend."""
+        return getattr(self.credentials, 'client_id', None) or self.client_secrets_file
+
+    def has_saved_credentials(self):
+        return os.path.exists(self.token_file)
+
+    def authenticate(self, scopes, logger, open_browser=True, interactive=True):
+        """Load, refresh or (if allowed) interactively obtain this channel's credentials.
+
+        Reuses the credentials saved in ``token_file``, refreshing them
+        silently when they have expired. Only when there are none (or the
+        refresh token was revoked) does it run the installed-app OAuth flow
+        on a local port; with ``open_browser`` off (headless machines) the
+        authorization URL is only printed. With ``interactive`` off that
+        case raises instead, so unattended workers fail fast.
+        """
+        from google.auth.exceptions import RefreshError
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+
+        credentials = None
+        if os.path.exists(self.token_file):
+            credentials = Credentials.from_authorized_user_file(self.token_file, scopes)
+            if not credentials.valid:
+                try:
+                    if not credentials.refresh_token:
+                        raise RefreshError("no refresh token")
+                    credentials.refresh(Request())
+                    logger.log(f"Refreshed saved credentials for channel {self.name}")
+                except RefreshError as e:
+                    logger.log(f"Saved credentials for channel {self.name} are no longer usable: {str(e)}", "WARNING")
+                    credentials = None
+
+        if credentials is None:
+            if not interactive:
+                raise Exception(
+                    f"No usable credentials in {self.token_file}; "
+                    f"run `python -m shorts_uploader auth --channel {self.name}` once on this machine")
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            logger.log(f"Log in to the YouTube account for channel {self.name}...")
+            flow = InstalledAppFlow.from_client_secrets_file(self.client_secrets_file, scopes)
+            credentials = flow.run_local_server(port=0, open_browser=open_browser)
+
+        self._save_credentials(credentials)
+        self.credentials = credentials
+        return credentials
+
+    def _save_credentials(self, credentials):
+        os.makedirs(os.path.dirname(self.token_file) or ".", exist_ok=True)
+        # The token holds a refresh token, so keep it readable by the owner only
+        partial_path = f"{self.token_file}.{uuid.uuid4()}.part"
+        fd = os.open(partial_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding='utf-8') as token:
+            token.write(credentials.to_json())
+        os.replace(partial_path, self.token_file)
+
+def load_channels(config_file, default_token_file, default_client_secrets_file):
+    """Return the configured channels, or a single "default" channel without a config file.
+
+    The config is a JSON object mapping channel names to optional
+    ``token_file`` and ``client_secrets`` paths, e.g.
+    ``{"main": {}, "gaming": {"client_secrets": "gaming_secrets.json"}}``.
+    Channels using different client secrets spend separate API quotas.
+    """
+    if not os.path.exists(config_file):
+        return [Channel("default", default_token_file, default_client_secrets_file)]
+
+    with open(config_file, encoding='utf-8') as config:
+        entries = json.load(config)
+    return [
+        Channel(
+            name,
+            options.get('token_file', os.path.join("tokens", f"{name}.json")),
+            options.get('client_secrets', default_client_secrets_file)
+        )
+        for name, options in entries.items()
+    ]
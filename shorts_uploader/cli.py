@@ -0,0 +1,233 @@
+"""Command line entry point: ``python -m shorts_uploader``.
+
+``upload`` processes one JSONL or CSV manifest and exits; ``daemon`` keeps
+running and picks up every manifest dropped into a spool directory, and
+``watch`` queues every video dropped into a folder.
+"""
+
+import argparse
+import glob
+import os
+import signal
+import threading
+from datetime import datetime
+
+from .engine import ShortsEngine
+from .logs import ConsoleLogger, JsonLinesLogger, TeeLogger
+from .manifest import SOURCES, read_manifest
+from .watch import FolderWatcher
+
+def date_arg(value):
+    """argparse type for ``YYYY-MM-DD`` dates."""
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY-MM-DD")
+    return value
+
+def build_engine(args, logger):
+    """Create an authenticated engine configured from the command line."""
+    engine = ShortsEngine(logger)
+    for stage in engine.stage_workers:
+        workers = getattr(args, f"{stage}_workers", None) or getattr(args, 'workers', None)
+        if workers:
+            engine.stage_workers[stage] = workers
+    if getattr(args, 'no_dedupe', False):
+        engine.dedupe = False
+    if getattr(args, 'stream', False):
+        engine.streaming = True
+    if getattr(args, 'max_items', None):
+        engine.playlist_max_items = args.max_items
+    if getattr(args, 'since', None):
+        engine.playlist_since = args.since
+    if getattr(args, 'reports_dir', None):
+        engine.reports_dir = args.reports_dir
+    if getattr(args, 'metrics_port', None):
+        engine.serve_metrics(args.metrics_port)
+    if args.client_secrets:
+        engine.client_secrets_file = args.client_secrets
+    if args.token_file:
+        engine.token_file = args.token_file
+    if args.channels:
+        engine.channels_file = args.channels
+    engine.authenticate(
+        open_browser=not args.no_browser,
+        interactive=not (getattr(args, 'unattended', False) or getattr(args, 'long_running', False)),
+        channel=getattr(args, 'login_channel', None))
+    return engine
+
+def build_logger(args):
+    """Log to stderr, and also to a JSON-lines file when ``--log-file`` is given."""
+    if args.log_file:
+        return TeeLogger(ConsoleLogger(), JsonLinesLogger(args.log_file))
+    return ConsoleLogger()
+
+def manifest_defaults(args):
+    return {
+        'source': args.source,
+        'title': args.title,
+        'caption': args.caption,
+        'privacy': args.privacy,
+        'tags': args.tags,
+        'channel': args.channel
+    }
+
+def cmd_auth(args):
+    logger = build_logger(args)
+    engine = build_engine(args, logger)
+    for channel in engine.active_channels():
+        logger.log(f"Credentials for channel {channel.name} saved to {channel.token_file}", "SUCCESS")
+    return 0
+
+def cmd_upload(args):
+    logger = build_logger(args)
+    engine = build_engine(args, logger)
+    engine.run(read_manifest(args.manifest, manifest_defaults(args), logger))
+    logger.log("Batch upload process completed", "SUCCESS")
+    upcoming = engine.journal.next_deferred()
+    if upcoming is not None:
+        logger.log("Some jobs were deferred for quota; run this manifest again or the daemon "
+                   "after the quota resets to upload them", "WARNING")
+    return 0
+
+def spool_manifests(directory):
+    return glob.glob(os.path.join(directory, "*.jsonl")) + glob.glob(os.path.join(directory, "*.csv"))
+
+def cmd_daemon(args):
+    logger = build_logger(args)
+    engine = build_engine(args, logger)
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    processing_dir = os.path.join(args.spool, "processing")
+    done_dir = os.path.join(args.spool, "done")
+    os.makedirs(processing_dir, exist_ok=True)
+    os.makedirs(done_dir, exist_ok=True)
+
+    def process(claimed):
+        """Run a manifest in ``processing/`` and move it to ``done/``, unless stopped partway."""
+        name = os.path.basename(claimed)
+        read_all = []
+
+        def jobs():
+            yield from read_manifest(claimed, manifest_defaults(args), logger)
+            read_all.append(True)
+
+        logger.log(f"Processing manifest {name}")
+        try:
+            engine.run(jobs(), stop=stop)
+        except Exception as e:
+            logger.log(f"Manifest {name} failed: {str(e)}", "ERROR")
+        if stop.is_set() and not read_all:
+            logger.log(f"Stopped partway through manifest {name}; it continues on the next start")
+            return
+        os.replace(claimed, os.path.join(done_dir, name))
+
+    # Interrupted jobs run in the engine's background queue, and deferred
+    # jobs rejoin it when their quota window reopens.
+    engine.resume_unfinished_jobs()
+
+    # Manifests left in processing/ by a crash or a stop are read again from
+    # the top; the journal skips the lines that were already uploaded
+    for claimed in sorted(spool_manifests(processing_dir)):
+        if stop.is_set():
+            break
+        process(claimed)
+
+    logger.log(f"Watching {args.spool} for manifests (every {args.interval}s)")
+    while not stop.is_set():
+        for manifest in sorted(spool_manifests(args.spool)):
+            if stop.is_set():
+                break
+            # Claim the manifest first, so a restart resumes it instead of queuing it again
+            claimed = os.path.join(processing_dir, os.path.basename(manifest))
+            os.replace(manifest, claimed)
+            process(claimed)
+        stop.wait(args.interval)
+
+    logger.log("Daemon stopped")
+    return 0
+
+def cmd_watch(args):
+    logger = build_logger(args)
+    engine = build_engine(args, logger)
+    defaults = {'title': args.title, 'caption': args.caption, 'privacy': args.privacy}
+    if args.tags:
+        defaults['tags'] = [tag.strip() for tag in args.tags.split(",") if tag.strip()]
+    if args.channel:
+        defaults['channel'] = args.channel
+    watcher = FolderWatcher(
+        engine, args.folder, defaults, interval=args.interval, settle_seconds=args.settle)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: watcher.stop())
+
+    engine.resume_unfinished_jobs()
+    watcher.run()
+    return 0
+
+def build_parser():
+    auth_options = argparse.ArgumentParser(add_help=False)
+    auth_options.add_argument("--client-secrets", help="OAuth client secrets file (default: client_secrets.json)")
+    auth_options.add_argument("--token-file", help="where login credentials are saved (default: token.json)")
+    auth_options.add_argument("--channels", help="JSON file listing the channels to upload to (default: channels.json)")
+    auth_options.add_argument("--no-browser", action="store_true",
+                              help="print the authorization URL instead of opening a browser")
+    auth_options.add_argument("--log-file", help="also append structured JSON-lines records to this file")
+
+    common = argparse.ArgumentParser(add_help=False, parents=[auth_options])
+    common.add_argument("--unattended", action="store_true",
+                        help="fail instead of starting a browser login when no saved credentials work")
+    common.add_argument("--workers", type=int, help="worker threads for every stage")
+    for stage in ("probe", "download", "fingerprint", "clean", "upload"):
+        common.add_argument(f"--{stage}-workers", type=int, help=f"worker threads for the {stage} stage")
+    common.add_argument("--no-dedupe", action="store_true",
+                        help="upload clips even when they look like one uploaded before")
+    common.add_argument("--stream", action="store_true",
+                        help="remux remote videos straight into the upload instead of via temp files")
+    common.add_argument("--max-items", type=int,
+                        help="take at most this many posts from each profile, hashtag or playlist URL")
+    common.add_argument("--since", type=date_arg,
+                        help="skip profile, hashtag and playlist posts from before this date (YYYY-MM-DD)")
+    common.add_argument("--reports-dir", help="where batch reports are written (default: reports)")
+    common.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics at http://127.0.0.1:PORT/metrics")
+    common.add_argument("--source", choices=SOURCES, help="source for manifest lines that do not name one")
+    common.add_argument("--title", default="Short {number}", help="title template, {number} is the item number")
+    common.add_argument("--caption", default="", help="description for lines without one")
+    common.add_argument("--tags", help="comma-separated tags for lines without any (default: Short)")
+    common.add_argument("--privacy", default="private", choices=("private", "unlisted", "public"))
+    common.add_argument("--channel", help="channel for lines without one (default: the channel with most quota left)")
+
+    parser = argparse.ArgumentParser(
+        prog="python -m shorts_uploader",
+        description="Download, clean and upload YouTube Shorts without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    auth = commands.add_parser("auth", parents=[auth_options], help="log in once and save the credentials")
+    auth.add_argument("--channel", dest="login_channel", help="log in only this channel")
+    auth.set_defaults(func=cmd_auth)
+
+    upload = commands.add_parser("upload", parents=[common], help="process one manifest and exit")
+    upload.add_argument("--manifest", required=True, help="JSONL or CSV file, one job per line")
+    upload.set_defaults(func=cmd_upload)
+
+    daemon = commands.add_parser("daemon", parents=[common], help="process manifests dropped into a spool directory")
+    daemon.add_argument("--spool", default="spool", help="directory to watch for *.jsonl and *.csv manifests")
+    daemon.add_argument("--interval", type=float, default=10.0, help="seconds between spool scans")
+    # Not unattended=True: the parent's --unattended action is shared, so
+    # changing its default here would change it for every command
+    daemon.set_defaults(func=cmd_daemon, long_running=True)
+
+    watch = commands.add_parser("watch", parents=[common], help="upload every video dropped into a folder")
+    watch.add_argument("--folder", required=True, help="directory to watch, subdirectories included")
+    watch.add_argument("--interval", type=float, default=2.0, help="seconds between polls without watchdog")
+    watch.add_argument("--settle", type=float, default=3.0,
+                       help="seconds a file's size must hold still before it is queued")
+    watch.set_defaults(func=cmd_watch, long_running=True)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
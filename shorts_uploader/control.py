@@ -0,0 +1,28 @@
+"""Cooperative cancellation of running jobs."""
+
+import threading
+
+class JobCancelled(Exception):
+    """Raised inside a job's stage once the job has been cancelled."""
+
+class CancelToken:
+    """Cancellation flag for one job, checked by long-running work between units of work.
+
+    Downloads check it in yt-dlp's progress hook, encodes while waiting on
+    ffmpeg and uploads before each chunk; :meth:`check` raises
+    :class:`JobCancelled` once :meth:`cancel` has been called.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise JobCancelled("cancelled")
@@ -0,0 +1,1669 @@
+"""Download, clean and upload engine shared by the GUI and the command line."""
+
+import glob
+import itertools
+import os
+import queue
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from datetime import datetime, timezone
+
+from .cache import DownloadCache
+from .channels import load_channels
+from .control import CancelToken, JobCancelled
+from .events import ProgressBus
+from .fingerprint import FingerprintIndex, decode_fingerprint, encode_fingerprint
+from .journal import JobJournal
+from .metrics import BatchReport, Metrics, MetricsServer
+from .media import (
+    REMUX_AUDIO_CODECS,
+    REMUX_CONTAINERS,
+    REMUX_VIDEO_CODECS,
+    available_cores,
+    ffmpeg_binary,
+    format_choice,
+    probe_media,
+    progressive_format,
+    run_command,
+    segmented_transcode,
+    shorts_violations,
+    transcode_video,
+)
+from .pipeline import PriorityJobQueue, StagePipeline
+from .quota import QuotaScheduler, is_quota_error
+from .upload import ChunkedUploader
+
+# yt-dlp, moviepy and the Google client libraries are imported where they
+# are first needed, so importing the engine (and opening the GUI) stays fast.
+
+class ShortsEngine:
+    """Runs upload jobs through the download, clean and upload stages.
+
+    A job is a dict with ``url``, ``source``, ``title``, ``caption`` and
+    ``privacy``, and optionally ``tags``, ``channel`` and ``priority``
+    (higher goes first, default 0). Progress and errors are reported through ``logger``, any
+    object with a ``log(message, level="INFO")`` method. ``on_idle`` is
+    called from the worker thread whenever a queued batch has drained.
+    Jobs can be cancelled, reprioritized and paused per stage while they
+    run (see :meth:`cancel`, :meth:`reprioritize` and :meth:`pause`).
+    """
+
+    def __init__(self, logger, on_idle=None):
+        self.logger = logger
+        self.on_idle = on_idle
+        self.upload_queue = PriorityJobQueue(key=self._priority_key)
+        self.is_processing = False
+        self._processing_lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._thread_local = threading.local()
+        self._open_downloaders = []
+        self._downloaders_lock = threading.Lock()
+        
+        # Worker threads per pipeline stage and the number of finished items
+        # a stage may hold for the next one before it has to wait.
+        self.stage_workers = {
+            'probe': 4,
+            'download': 3,
+            'fingerprint': 2,
+            'clean': 2,
+            'upload': 1
+        }
+        self.stage_queue_size = 4
+        
+        # A stage whose gate is clear is paused: its workers take no new
+        # jobs and its running downloads and uploads hold before their next
+        # fragment or chunk. Jobs in flight are registered by journal key
+        # so they can be cancelled or reprioritized.
+        self.stage_gates = {stage: threading.Event() for stage in self.stage_workers}
+        for gate in self.stage_gates.values():
+            gate.set()
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._pipeline = None
+        
+        # "auto" strips metadata with a lossless stream copy whenever the
+        # source is already YouTube-friendly; "reencode" always transcodes.
+        self.clean_mode = 'auto'
+        
+        # Shorts requirements checked from metadata before anything is
+        # downloaded or decoded. "reject" drops offending items, "flag" only
+        # warns about them.
+        self.shorts_rules = {
+            'max_duration': 180,
+            'vertical': True,
+            'video_codecs': None
+        }
+        self.probe_action = 'reject'
+        
+        # Profile, hashtag and playlist URLs are expanded into one job per
+        # post (see expand_jobs). At most playlist_max_items posts are taken
+        # from a listing and posts from before playlist_since ("YYYY-MM-DD")
+        # are skipped; a job's own max_items and since override both. Since
+        # profiles list newest first (pinned posts aside), listing stops
+        # after playlist_stop_after_older older posts in a row.
+        self.playlist_max_items = None
+        self.playlist_since = None
+        self.playlist_stop_after_older = 20
+        
+        self.download_cache = DownloadCache("cache", budget_bytes=5 * 1024 ** 3)
+        self.journal = JobJournal("state/journal.sqlite3")
+        
+        # Downloads whose sampled frames (and audio, when both have it) are
+        # within these fractions of differing bits of an earlier upload are
+        # skipped as re-posts of the same clip. The index is loaded on first use.
+        self.dedupe = True
+        self.dedupe_max_video_distance = 0.12
+        self.dedupe_max_audio_distance = 0.2
+        self.fingerprints_file = "state/fingerprints.sqlite3"
+        self._fingerprint_index = None
+        self._fingerprint_lock = threading.Lock()
+        
+        # Each upload costs 1,600 of the project's 10,000 daily quota units.
+        # Uploads past the budget are deferred to the next reset, and the
+        # token bucket keeps the upload rate at or below uploads_per_hour.
+        self.quota = QuotaScheduler(
+            "state/quota.sqlite3", daily_quota=10000, upload_cost=1600,
+            uploads_per_hour=60, burst=5)
+        self._resume_timer = None
+        self._resume_at = None
+        
+        # Initial upload chunk size; with adaptive chunks it is retuned to
+        # the measured throughput as the upload goes.
+        self.upload_chunk_size = 8 * 1024 * 1024
+        self.upload_adaptive_chunks = True
+        self.upload_max_retries = 8
+        
+        # With streaming on, remote videos served as a single stream-copyable
+        # file are remuxed by ffmpeg straight into the upload and never touch
+        # the disk. Memory per upload stays below the buffer plus the largest
+        # chunk. Other sources still take the download path.
+        self.streaming = False
+        self.stream_buffer_size = 16 * 1024 * 1024
+        self.stream_max_chunk_size = 32 * 1024 * 1024
+        
+        # yt-dlp downloads the largest H.264/AAC rendition (which the clean
+        # stage only has to remux) whose shorter side is at most
+        # max_download_resolution, as long as it is at least
+        # min_remux_resolution; otherwise the best rendition up to
+        # max_download_resolution in any codec. Ties are broken per platform
+        # by format_sort in platform_opts. HLS/DASH downloads fetch
+        # fragment_downloads fragments at a time.
+        self.max_download_resolution = 1080
+        self.min_remux_resolution = 720
+        self.fragment_downloads = 4
+        
+        # Re-encodes run in a process pool. Leave transcode_workers as None
+        # to size it from the available cores so that workers times encoder
+        # threads per job does not exceed the machine.
+        self.transcode_workers = None
+        self.transcode_threads = 2
+        self._transcode_executor = None
+        self._transcode_lock = threading.Lock()
+        self._pool_encodes = 0
+        
+        # A re-encode of a clip at least segment_min_duration seconds long or
+        # with more than segment_min_pixels per frame is cut at keyframes
+        # and its segments encoded in parallel on the cores the pool's
+        # encodes leave free, or in the pool when fewer than two are. Only
+        # one such clip is encoded at a time.
+        self.segment_encode = True
+        self.segment_min_duration = 90
+        self.segment_min_pixels = 1920 * 1080
+        self._segment_lock = threading.Lock()
+        
+        self.SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
+        self.api_service_name = "youtube"
+        self.api_version = "v3"
+        self.client_secrets_file = "client_secrets.json"
+        # Refreshable credentials are saved here after the first login, and
+        # the API discovery document is kept locally so building a client
+        # never needs a network round trip.
+        self.token_file = "token.json"
+        self.discovery_cache_file = os.path.join("cache", f"discovery-{self.api_service_name}-{self.api_version}.json")
+        self.discovery_document = None
+        # Optional JSON file listing several channels (see load_channels);
+        # without it the engine uploads to the single token_file account.
+        self.channels_file = "channels.json"
+        self.channels = []
+        self._route_lock = threading.Lock()
+        self.credentials = None
+        self.youtube = None
+        
+        # Every job records its stage timings, sizes and retries. They feed
+        # the counters and histograms below (served for Prometheus by
+        # serve_metrics) and a JSON/CSV report per batch in reports_dir,
+        # whose rows are written as jobs finish.
+        self.metrics = Metrics()
+        for name, text in (
+            ("shorts_jobs_total", "Jobs finished, by source and outcome"),
+            ("shorts_queue_wait_seconds", "Time jobs waited before the first stage"),
+            ("shorts_stage_seconds", "Time spent in each pipeline stage"),
+            ("shorts_download_bytes_total", "Bytes downloaded"),
+            ("shorts_download_bytes_saved_total", "Bytes not downloaded compared with the best rendition offered"),
+            ("shorts_transcodes_avoided_total", "Jobs remuxed whose best rendition would have needed a re-encode"),
+            ("shorts_clean_total", "Cleaned videos, by the path taken"),
+            ("shorts_upload_bytes_total", "Bytes uploaded"),
+            ("shorts_upload_retries_total", "Retried upload chunks"),
+        ):
+            self.metrics.describe(name, text)
+        self._metrics_server = None
+        self.reports_dir = "reports"
+        
+        # Each job's stage and transfer progress, for a UI to poll (see
+        # ProgressBus). Jobs are keyed by their journal key.
+        self.progress = ProgressBus()
+        
+        # Basic yt-dlp options
+        self.ydl_opts = {
+            'merge_output_format': 'mp4',
+            # Jobs for the same post (see _journaled) each get their own file
+            'outtmpl': 'downloads/%(id)s-%(_shorts_job)s.%(ext)s',
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': False,
+            'http_headers': {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.5',
+                'Accept-Encoding': 'gzip, deflate',
+                'DNT': '1',
+                'Connection': 'keep-alive',
+            },
+        }
+        
+        # Initialize platform-specific options
+        self.platform_opts = {
+            'TikTok': {
+                # Single files, the same clip both as H.264 and as HEVC ("bytevc1")
+                'format_sort': ['vcodec:h264', 'acodec:aac', 'ext:mp4:m4a'],
+                'force_generic_extractor': False,
+                'extractor_args': {
+                    'tiktok': {
+                        'embed_url': None,
+                        'api_hostname': 'api16-normal-c-useast1a.tiktokv.com',
+                        'app_version': '1.0.0',
+                        'manifest_app_version': '1.0.0'
+                    }
+                }
+            },
+            'Instagram': {
+                # Mostly DASH: separate H.264 video and AAC audio to merge
+                'format_sort': ['vcodec:h264', 'acodec:aac', 'ext:mp4:m4a'],
+                'force_generic_extractor': False,
+                'extract_flat': True
+            },
+            'Facebook': {
+                # DASH renditions plus progressive "sd"/"hd" files; at equal
+                # size the single file saves the merge
+                'format_sort': ['vcodec:h264', 'acodec:aac', 'ext:mp4:m4a', 'proto:https'],
+                'force_generic_extractor': False,
+                'extract_flat': True
+            }
+        }
+
+    def submit(self, upload_data):
+        """Queue a job and start the background worker if it is idle."""
+        self.upload_queue.put(upload_data)
+        self.start_processing()
+
+    def start_processing(self, jobs=None):
+        """Start draining the upload queue on a background thread if not already running.
+
+        ``jobs``, an iterable such as a manifest being read, is run first;
+        it is consumed as the pipeline asks for work, never all at once.
+        """
+        with self._processing_lock:
+            if self.is_processing:
+                return False
+            self.is_processing = True
+        threading.Thread(target=self.process_queue, args=(jobs,), daemon=True).start()
+        return True
+
+    def resume_unfinished_jobs(self):
+        """Queue jobs the journal shows were interrupted in an earlier session."""
+        upcoming = self.journal.next_deferred()
+        if upcoming is not None and upcoming > time.time():
+            self._schedule_deferred_resume(upcoming)
+        pending = self.journal.unfinished()
+        if not pending:
+            return 0
+        self.logger.log(f"Resuming {len(pending)} unfinished jobs from the previous session...", "INFO")
+        for upload_data in pending:
+            self.upload_queue.put(upload_data)
+        self.start_processing()
+        return len(pending)
+
+    def process_queue(self, jobs=None):
+        """Process ``jobs``, then the upload queue, through the download, clean and upload stages."""
+        try:
+            self.run(itertools.chain(jobs or (), self._drain_upload_queue()))
+        finally:
+            with self._processing_lock:
+                self.is_processing = False
+            self.logger.log("Batch upload process completed", "SUCCESS")
+            # Pick up jobs submitted after the queue looked empty
+            if not self.upload_queue.empty() and self.start_processing():
+                return
+            if self.on_idle:
+                self.on_idle()
+
+    def run(self, jobs, stop=None):
+        """Run every job in the iterable ``jobs`` through the pipeline and block until done.
+
+        Once ``stop`` (an Event) is set no further jobs are taken from
+        ``jobs``; those already queued still finish.
+        """
+        # Keep at least one clean worker per transcode process so the pool
+        # never sits idle while re-encodes are waiting.
+        clean_workers = max(self.stage_workers['clean'], self._transcode_plan()[0])
+        # ...and at least one upload worker per channel so channels upload in parallel
+        upload_workers = max(self.stage_workers['upload'], len(self.active_channels()))
+        stages = [
+            ("probe", self._probe_stage, self.stage_workers['probe']),
+            ("download", self._download_stage, self.stage_workers['download']),
+            ("fingerprint", self._fingerprint_stage, self.stage_workers['fingerprint']),
+            ("clean", self._clean_stage, clean_workers),
+            ("upload", self._upload_stage, upload_workers)
+        ]
+        pipeline = StagePipeline(
+            [(name, self._timed(name, func), workers) for name, func, workers in stages],
+            queue_size=self.stage_queue_size,
+            on_error=self._stage_failed,
+            priority=self._priority_key,
+            gates=self.stage_gates
+        )
+        # Batches share the downloaders and the transcode pool, so a batch
+        # started while another is running (e.g. deferred jobs coming due)
+        # waits for it to finish.
+        with self._run_lock:
+            report = BatchReport(self.reports_dir, datetime.now()) if self.reports_dir else None
+            self._pipeline = pipeline
+            try:
+                pipeline.run(self._journaled(self._until_stopped(self.expand_jobs(jobs), stop), report))
+            finally:
+                self._pipeline = None
+                self._close_downloaders()
+                self._shutdown_transcode_pool()
+                self._close_report(report)
+
+    @staticmethod
+    def _until_stopped(jobs, stop):
+        """Yield from ``jobs`` until ``stop`` is set, without reading a job past it."""
+        jobs = iter(jobs)
+        while stop is None or not stop.is_set():
+            try:
+                upload_data = next(jobs)
+            except StopIteration:
+                return
+            yield upload_data
+
+    def _drain_upload_queue(self):
+        """Yield queued uploads until the queue runs dry."""
+        while True:
+            try:
+                upload_data = self.upload_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.upload_queue.task_done()
+            yield upload_data
+
+    @staticmethod
+    def _priority_key(upload_data):
+        return -(upload_data.get('priority') or 0)
+
+    def cancel(self, key):
+        """Cancel the job with journal key ``key``; return False if it is not waiting or running.
+
+        A job still waiting, in the upload queue or between stages, is
+        dropped and its files released right away. A running one stops at
+        its next checkpoint (yt-dlp's next progress report, the next poll of
+        its ffmpeg processes or its next upload chunk) and is released then.
+        Cancelled jobs are not resumed in a later session.
+        """
+        removed = self.upload_queue.remove(lambda job: JobJournal.job_key(job) == key)
+        if removed:
+            self.journal.cancel(key)
+            self.logger.log(f"⛔ Cancelled {removed[0]['url']}", "WARNING")
+            return True
+        
+        with self._jobs_lock:
+            upload_data = self._jobs.get(key)
+        if upload_data is None:
+            return False
+        upload_data['cancel'].cancel()
+        pipeline = self._pipeline
+        if pipeline is not None and pipeline.remove(upload_data):
+            # Waiting between stages, so no worker will see it again
+            self._cancelled(upload_data)
+        else:
+            self.logger.log(f"Cancelling {upload_data['url']}...")
+        return True
+
+    def reprioritize(self, key, priority=None):
+        """Set the priority of the job with journal key ``key``; None puts it ahead of every other job.
+
+        The job moves up (or down) in whichever queue it waits in now and
+        keeps the priority for the stages after it. Returns False if the job
+        is not waiting or running.
+        """
+        with self._jobs_lock:
+            jobs = list(self._jobs.values())
+        waiting = self.upload_queue.items()
+        matches = [job for job in jobs + waiting if job.get('journal_key', JobJournal.job_key(job)) == key]
+        if not matches:
+            return False
+        if priority is None:
+            priority = max((job.get('priority') or 0 for job in jobs + waiting), default=0) + 1
+        for job in matches:
+            job['priority'] = priority
+        self.upload_queue.reorder()
+        pipeline = self._pipeline
+        if pipeline is not None:
+            pipeline.reorder()
+        return True
+
+    def pause(self, stage=None):
+        """Pause ``stage`` (or every stage) until :meth:`resume`.
+
+        Its workers take no new jobs and running downloads and uploads hold
+        before their next fragment or chunk; a running encode finishes.
+        """
+        for name in [stage] if stage else self.stage_gates:
+            self.stage_gates[name].clear()
+
+    def resume(self, stage=None):
+        for name in [stage] if stage else self.stage_gates:
+            self.stage_gates[name].set()
+
+    def is_paused(self, stage):
+        return not self.stage_gates[stage].is_set()
+
+    def _checkpoint(self, upload_data, stage):
+        """Wait while ``stage`` is paused, then raise JobCancelled if the job was cancelled."""
+        gate = self.stage_gates[stage]
+        while not gate.is_set() and not upload_data['cancel'].cancelled:
+            gate.wait(0.5)
+        upload_data['cancel'].check()
+
+    def _cancelled(self, upload_data):
+        """Record a cancelled job and release its files and its fingerprint claim."""
+        self.logger.log(f"⛔ Cancelled {upload_data['url']}", "WARNING")
+        self.journal.cancel(upload_data['journal_key'])
+        self._finish_job(upload_data, 'cancelled')
+        if upload_data.get('fingerprint'):
+            self.fingerprint_index().release(upload_data['fingerprint'], upload_data['url'])
+        self._discard_download(upload_data)
+        # yt-dlp's .part, .ytdl and fragment files of an interrupted download
+        if upload_data.get('download_base'):
+            for path in glob.glob(glob.escape(upload_data['download_base']) + ".*"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def expand_jobs(self, jobs):
+        """Yield ``jobs`` with profile, hashtag and playlist URLs replaced by one job per post.
+
+        Listings are read with yt-dlp's flat extraction a page at a time, as
+        the pipeline asks for more jobs, so the first uploads start while
+        later pages are still being listed and memory does not grow with the
+        size of the account. A job's ``max_items`` caps the posts taken from
+        it and ``since`` (``YYYY-MM-DD``) skips older ones; see
+        ``playlist_max_items`` and ``playlist_since`` for the defaults.
+        "{number}" in titles is replaced by the running item number.
+        """
+        number = 0
+        for upload_data in jobs:
+            if self._is_listing(upload_data):
+                expanded = self._listing_jobs(upload_data)
+            else:
+                expanded = [upload_data]
+            for job in expanded:
+                number += 1
+                if job.get('title'):
+                    job['title'] = job['title'].replace("{number}", str(number))
+                yield job
+
+    def _is_listing(self, upload_data):
+        """Return True if a job's URL is a profile, hashtag or playlist rather than a single post."""
+        if upload_data['source'] == "Local File" or upload_data.get('resumed'):
+            return False
+        import yt_dlp
+        for extractor in yt_dlp.extractor.gen_extractor_classes():
+            if extractor.ie_key() == 'Generic' or not extractor.suitable(upload_data['url']):
+                continue
+            return extractor.is_single_video(upload_data['url']) is False
+        return False
+
+    def _listing_jobs(self, upload_data):
+        """Yield a job per post of a listing URL, fetching its pages lazily."""
+        import yt_dlp
+        
+        url = upload_data['url']
+        limit = upload_data.get('max_items', self.playlist_max_items)
+        opts = self.ydl_opts.copy()
+        opts.update(self.platform_opts.get(upload_data['source'], {}))
+        opts.update(extract_flat='in_playlist', lazy_playlist=True)
+        
+        self.logger.log(f"Listing posts of {url}...")
+        taken = older = 0
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            try:
+                # A bad date only stops this listing, not the whole batch
+                since = self._date_key(upload_data.get('since') or self.playlist_since)
+                listing = ydl.extract_info(url, download=False, process=False)
+                if listing.get('_type') not in ('playlist', 'multi_video'):
+                    # Resolved to a single post after all
+                    yield upload_data
+                    return
+                for entry in self._flat_entries(listing):
+                    if limit and taken >= limit:
+                        break
+                    posted = self._entry_date(entry)
+                    if since and posted and posted < since:
+                        older += 1
+                        if older >= self.playlist_stop_after_older:
+                            self.logger.log(f"Reached posts from before {since} in {url}, stopping the listing")
+                            break
+                        continue
+                    older = 0
+                    post_url = entry.get('webpage_url') or entry.get('url')
+                    if not post_url:
+                        continue
+                    job = {key: value for key, value in upload_data.items() if key != 'max_items'}
+                    job.update(url=post_url, listing=url)
+                    if since:
+                        job['since'] = since
+                    taken += 1
+                    yield job
+            except Exception as e:
+                self.logger.log(f"❌ Listing {url} stopped after {taken} posts: {str(e)}", "ERROR")
+                return
+        self.logger.log(f"Queued {taken} posts from {url}")
+
+    def _flat_entries(self, listing):
+        """Yield the entries of a flat listing, descending into nested listings."""
+        from yt_dlp.utils import PagedList
+        
+        entries = listing.get('entries')
+        if isinstance(entries, PagedList):
+            # Walk the pages without the page cache, which would keep them all
+            entries._use_cache = False
+            entries = entries._getslice(0, None)
+        for entry in entries or []:
+            if not entry:
+                continue
+            if entry.get('_type') in ('playlist', 'multi_video'):
+                yield from self._flat_entries(entry)
+            else:
+                yield entry
+
+    def _entry_date(self, info_dict):
+        """Return when a post went up as "YYYYMMDD" (UTC), or None if the metadata does not say."""
+        if info_dict.get('upload_date'):
+            return info_dict['upload_date']
+        for key in ('timestamp', 'release_timestamp'):
+            if info_dict.get(key):
+                return datetime.fromtimestamp(info_dict[key], timezone.utc).strftime('%Y%m%d')
+        return None
+
+    def _date_key(self, value):
+        """Normalize a "YYYY-MM-DD" (or "YYYYMMDD") date to "YYYYMMDD"; None stays None."""
+        if not value:
+            return None
+        key = str(value).replace("-", "")
+        if not re.fullmatch(r"\d{8}", key):
+            raise Exception(f"Invalid date {value!r}, expected YYYY-MM-DD")
+        return key
+
+    def _journaled(self, jobs, report):
+        """Register each job in the journal, skipping finished ones and resuming interrupted ones.
+
+        Each job's metrics record goes to ``report`` (a :class:`BatchReport`
+        or None) once the job is finished.
+        """
+        for upload_data in jobs:
+            record = self.journal.begin(upload_data)
+            upload_data['journal_key'] = record['key']
+            upload_data['metrics'] = {'url': upload_data['url'], 'source': upload_data['source']}
+            upload_data['queued_at'] = time.monotonic()
+            upload_data['cancel'] = CancelToken()
+            upload_data['report'] = report
+            if report is not None:
+                report.start(upload_data['metrics'])
+            with self._jobs_lock:
+                in_flight = record['key'] in self._jobs
+            if in_flight:
+                # A repeated manifest line, or a post also reached through its
+                # profile; its progress row belongs to the job already running
+                self.logger.log(f"Skipping {upload_data['url']}: already queued")
+                upload_data['metrics'].update(outcome='skipped', error="already queued")
+                self.metrics.inc("shorts_jobs_total", source=upload_data['source'], outcome='skipped')
+                if report is not None:
+                    report.finish(upload_data['metrics'])
+                continue
+            self.progress.publish(
+                record['key'], url=upload_data['url'], title=upload_data.get('title'), stage='queued',
+                download=None, upload=None, speed=None, eta=None)
+            if record['stage'] == 'done':
+                self.logger.log(f"Skipping {upload_data['url']}: already uploaded as {record['video_id']}")
+                self._finish_job(upload_data, 'skipped')
+                continue
+            if record['stage'] == 'deferred' and record['not_before'] > time.time():
+                self.logger.log(f"Skipping {upload_data['url']}: deferred until {self._format_time(record['not_before'])}")
+                self._schedule_deferred_resume(record['not_before'])
+                self._finish_job(upload_data, 'deferred')
+                continue
+
+            # A job whose clean file survived can go straight back to upload
+            if record['stage'] in ('cleaned', 'uploading', 'deferred') and record['video_file'] \
+                    and os.path.exists(record['video_file']):
+                upload_data['video_file'] = record['video_file']
+                upload_data['upload_uri'] = record['upload_uri']
+                upload_data['resumed'] = True
+                if record['fingerprint']:
+                    upload_data['fingerprint'] = decode_fingerprint(record['fingerprint'])
+                # A session URI only works for the account that opened it
+                if record['upload_uri'] and record['channel']:
+                    upload_data['routed_channel'] = record['channel']
+            with self._jobs_lock:
+                self._jobs[record['key']] = upload_data
+            yield upload_data
+
+    def _timed(self, stage, func):
+        """Wrap a stage function so its duration lands in the job's record and histogram."""
+        def run_stage(upload_data):
+            record = upload_data['metrics']
+            started = time.monotonic()
+            self.progress.publish(upload_data['journal_key'], stage=stage, speed=None, eta=None)
+            if stage == "probe":
+                record['queue_wait_seconds'] = started - upload_data['queued_at']
+                self.metrics.observe("shorts_queue_wait_seconds", record['queue_wait_seconds'],
+                                     source=upload_data['source'])
+            # A job finished inside the stage is reported once its time is in
+            self._thread_local.stage_job = upload_data
+            try:
+                upload_data['cancel'].check()
+                result = func(upload_data)
+                if result is not None:
+                    upload_data['cancel'].check()
+                return result
+            finally:
+                self._thread_local.stage_job = None
+                elapsed = time.monotonic() - started
+                record[f"{stage}_seconds"] = elapsed
+                self.metrics.observe("shorts_stage_seconds", elapsed, stage=stage, source=upload_data['source'])
+                if record.get('outcome') and upload_data.get('report') is not None:
+                    upload_data['report'].finish(record)
+        return run_stage
+
+    def _finish_job(self, upload_data, outcome, error=None):
+        record = upload_data['metrics']
+        record['outcome'] = outcome
+        if error:
+            record['error'] = error
+        self.metrics.inc("shorts_jobs_total", source=upload_data['source'], outcome=outcome)
+        self.progress.publish(upload_data.get('journal_key'), stage=outcome, speed=None, eta=None)
+        with self._jobs_lock:
+            if self._jobs.get(upload_data.get('journal_key')) is upload_data:
+                del self._jobs[upload_data['journal_key']]
+        report = upload_data.get('report')
+        if report is not None and getattr(self._thread_local, 'stage_job', None) is not upload_data:
+            report.finish(record)
+
+    def _close_report(self, report):
+        """Finish the batch's JSON/CSV report, if it had any jobs."""
+        if report is None:
+            return
+        try:
+            json_path, _ = report.close(datetime.now())
+            if json_path:
+                self.logger.log(f"Batch report written to {json_path}")
+        except Exception as e:
+            self.logger.log(f"Could not write the batch report: {str(e)}", "WARNING")
+
+    def serve_metrics(self, port=9464, host="127.0.0.1"):
+        """Serve the metrics in the Prometheus text format at ``http://host:port/metrics``."""
+        if self._metrics_server is None:
+            self._metrics_server = MetricsServer(self.metrics, port, host)
+            self.logger.log(f"Serving metrics on http://{host}:{self._metrics_server.port}/metrics")
+        return self._metrics_server
+
+    def _probe_stage(self, upload_data):
+        """Check a job against the Shorts rules before any download or encode.
+
+        Cache hits and local files are probed from their container headers;
+        remote items from the metadata yt-dlp extracts, which is kept on the
+        job so the download stage does not extract the page again.
+        """
+        if upload_data.get('resumed'):
+            return upload_data
+        self.logger.log(f"Processing: {upload_data['url']}")
+        
+        if upload_data['source'] == "Local File":
+            metadata = probe_media(upload_data['url'])
+        else:
+            upload_data['cache_key'] = self.cache_key(upload_data['url'], upload_data['source'])
+            cached_file = None
+            if upload_data['cache_key']:
+                os.makedirs("downloads", exist_ok=True)
+                cached_file = self.download_cache.fetch(upload_data['cache_key'], "downloads")
+            if cached_file:
+                self.logger.log(f"Using cached copy of {upload_data['url']}")
+                upload_data['video_file'] = cached_file
+                upload_data['cached'] = True
+                metadata = probe_media(cached_file)
+            else:
+                upload_data['info'] = self.extract_info(upload_data['url'], upload_data['source'])
+                metadata = self._info_metadata(upload_data['info'])
+                # Posts whose date the listing did not show are checked here
+                posted = self._entry_date(upload_data['info'])
+                since = self._date_key(upload_data.get('since'))
+                if since and posted and posted < since:
+                    reason = f"posted {posted}, before {since}"
+                    self.logger.log(f"⏭ Skipping {upload_data['url']}: {reason}")
+                    self.journal.update(upload_data['journal_key'], stage='rejected', error=reason)
+                    self._finish_job(upload_data, 'rejected', reason)
+                    return None
+        
+        violations = shorts_violations(metadata, self.shorts_rules)
+        if not violations:
+            return upload_data
+        
+        reason = "; ".join(violations)
+        if self.probe_action != 'reject':
+            self.logger.log(f"⚠ {upload_data['url']} may not work as a Short: {reason}", "WARNING")
+            upload_data['probe_flags'] = violations
+            return upload_data
+        
+        self.logger.log(f"⛔ Rejected {upload_data['url']}: {reason}", "WARNING")
+        self.journal.update(upload_data['journal_key'], stage='rejected', error=reason)
+        self._finish_job(upload_data, 'rejected', reason)
+        self._discard_download(upload_data)
+        return None
+
+    def _info_metadata(self, info_dict):
+        """Pull duration, display size and video codec out of a yt-dlp info dict."""
+        if info_dict.get('_type') in ('playlist', 'multi_video'):
+            entries = [entry for entry in info_dict.get('entries') or [] if entry]
+            info_dict = entries[0] if entries else {}
+        return {
+            'duration': info_dict.get('duration'),
+            'width': info_dict.get('width'),
+            'height': info_dict.get('height'),
+            'video_codec': info_dict.get('vcodec')
+        }
+
+    def _download_stage(self, upload_data):
+        if upload_data.get('resumed') or upload_data.get('cached'):
+            return upload_data
+        
+        choice = format_choice(upload_data['info']) if upload_data.get('info') else None
+        if self.streaming and upload_data.get('info'):
+            stream = self._stream_format(upload_data)
+            if stream:
+                upload_data.pop('info')
+                upload_data['stream'] = stream
+                self._record_format_choice(upload_data, choice, choice and choice['picked_bytes'])
+                self.logger.log(f"Streaming {upload_data['url']} straight into the upload")
+                self.journal.update(upload_data['journal_key'], stage='downloaded')
+                return upload_data
+            self.logger.log(f"{upload_data['url']} cannot be streamed, downloading it first")
+        
+        started = time.monotonic()
+        info_dict = upload_data.pop('info', None)
+        # yt-dlp's progress hooks find the job through its info dict, or
+        # through the thread when the download extracts the page itself
+        if info_dict is not None:
+            info_dict['_shorts_job'] = upload_data['journal_key']
+            if upload_data['source'] != "Local File":
+                # Where a cancelled download's partial files are
+                upload_data['download_base'] = os.path.splitext(
+                    self._downloader(upload_data['source']).prepare_filename(info_dict))[0]
+        self._thread_local.progress_key = upload_data['journal_key']
+        try:
+            upload_data['video_file'] = self.download_video(
+                upload_data['url'], upload_data['source'], info_dict=info_dict,
+                job_key=upload_data['journal_key'])
+        finally:
+            self._thread_local.progress_key = None
+        if upload_data['source'] != "Local File":
+            size = os.path.getsize(upload_data['video_file'])
+            record = upload_data['metrics']
+            record['download_bytes'] = size
+            record['download_bytes_per_second'] = size / max(time.monotonic() - started, 1e-6)
+            self.metrics.inc("shorts_download_bytes_total", size, source=upload_data['source'])
+            self._record_format_choice(upload_data, choice, size)
+        self.journal.update(upload_data['journal_key'], stage='downloaded', video_file=upload_data['video_file'])
+        return upload_data
+
+    def _record_format_choice(self, upload_data, choice, size):
+        """Record the bytes the format policy saved over the best rendition, given ``size`` fetched."""
+        if choice is None:
+            return
+        upload_data['baseline_remuxable'] = choice['baseline_remuxable']
+        if choice['changed'] and choice['baseline_bytes'] and size:
+            saved = max(0, int(choice['baseline_bytes'] - size))
+            upload_data['metrics']['download_bytes_saved'] = saved
+            self.metrics.inc("shorts_download_bytes_saved_total", saved, source=upload_data['source'])
+
+    def _stream_format(self, upload_data):
+        """Return the stream to remux for a job, with the downloader's cookies for its URL."""
+        stream = progressive_format(upload_data['info'])
+        if stream is None:
+            return None
+        try:
+            cookies = self._downloader(upload_data['source']).cookiejar.get_cookies_for_url(stream['url'])
+        except Exception:
+            cookies = []
+        if cookies:
+            stream['http_headers'] = dict(
+                stream['http_headers'], Cookie="; ".join(f"{c.name}={c.value}" for c in cookies))
+        return stream
+
+    def _fingerprint_stage(self, upload_data):
+        """Skip a download that is a near-duplicate of an uploaded (or uploading) clip."""
+        if upload_data.get('resumed') or not self.dedupe:
+            return upload_data
+        
+        index = self.fingerprint_index()
+        try:
+            fingerprint = index.fingerprint(upload_data.get('video_file'), stream=upload_data.get('stream'))
+        except Exception as e:
+            self.logger.log(f"Could not fingerprint {upload_data['url']}, not checking for duplicates: {str(e)}", "WARNING")
+            return upload_data
+        
+        original = index.claim(fingerprint, upload_data['url'])
+        if original is None:
+            upload_data['fingerprint'] = fingerprint
+            # Resumed and deferred jobs skip this stage but still commit it after upload
+            self.journal.update(upload_data['journal_key'], fingerprint=encode_fingerprint(fingerprint))
+            return upload_data
+        
+        if original['video_id']:
+            reason = f"near-duplicate of video {original['video_id']} ({original['url']})"
+        else:
+            reason = f"near-duplicate of {original['url']} in this batch"
+        self.logger.log(f"⏭ Skipping {upload_data['url']}: {reason}", "WARNING")
+        self.journal.update(upload_data['journal_key'], stage='duplicate', error=reason)
+        self._finish_job(upload_data, 'duplicate', reason)
+        self._discard_download(upload_data)
+        return None
+    
+    def fingerprint_index(self):
+        """Return the index of uploaded clips' fingerprints, loading it on first use."""
+        with self._fingerprint_lock:
+            if self._fingerprint_index is None:
+                self._fingerprint_index = FingerprintIndex(
+                    self.fingerprints_file,
+                    max_video_distance=self.dedupe_max_video_distance,
+                    max_audio_distance=self.dedupe_max_audio_distance)
+            return self._fingerprint_index
+
+    def _clean_stage(self, upload_data):
+        if upload_data.get('resumed'):
+            return upload_data
+        if upload_data.get('stream'):
+            # Streams are remuxed on their way into the upload
+            upload_data['clean_path'] = "stream"
+            self._record_clean(upload_data)
+            self.journal.update(upload_data['journal_key'], stage='cleaned')
+            return upload_data
+        
+        # Clean metadata if not local file; cache hits are already clean
+        if upload_data['source'] == "Local File":
+            upload_data['clean_path'] = "none"
+        elif upload_data.get('cached'):
+            upload_data['clean_path'] = "cached"
+        else:
+            upload_data['video_file'] = self.clean_metadata(upload_data['video_file'], upload_data)
+            if upload_data.get('cache_key'):
+                try:
+                    self.download_cache.store(upload_data['cache_key'], upload_data['video_file'])
+                except Exception as e:
+                    self.logger.log(f"Could not cache {upload_data['url']}: {str(e)}", "WARNING")
+        self._record_clean(upload_data)
+        self.journal.update(upload_data['journal_key'], stage='cleaned', video_file=upload_data['video_file'])
+        return upload_data
+
+    def _record_clean(self, upload_data):
+        record = upload_data['metrics']
+        record['clean_path'] = upload_data['clean_path']
+        record['clean_sha256'] = upload_data.get('clean_sha256')
+        self.metrics.inc("shorts_clean_total", source=upload_data['source'], path=upload_data['clean_path'])
+        if 'baseline_remuxable' in upload_data:
+            # The best rendition would have needed a re-encode; the one picked did not
+            record['transcode_avoided'] = (
+                upload_data['clean_path'] in ('remux', 'stream') and upload_data['baseline_remuxable'] is False)
+            if record['transcode_avoided']:
+                self.metrics.inc("shorts_transcodes_avoided_total", source=upload_data['source'])
+
+    def cache_key(self, url, source):
+        """Return a cache key for ``url`` built from its extractor and video id, without network access."""
+        import yt_dlp
+        for extractor in yt_dlp.extractor.gen_extractor_classes():
+            if extractor.ie_key() == 'Generic' or not extractor.suitable(url):
+                continue
+            video_id = extractor.get_temp_id(url)
+            if video_id:
+                return f"{source}:{extractor.ie_key()}:{video_id}"
+            return None
+        return None
+
+    def _upload_stage(self, upload_data):
+        key = upload_data['journal_key']
+        record = upload_data['metrics']
+        stats = {}
+        deferred = False
+        # Project whose reserved upload no videos.insert request has spent yet
+        reserved = {}
+
+        def checkpoint():
+            self._checkpoint(upload_data, 'upload')
+            # The chunk request after this one sends videos.insert
+            reserved.pop('project', None)
+
+        try:
+            while True:
+                channel = self._reserve_channel(upload_data)
+                if channel is None:
+                    self._defer(upload_data, "daily upload quota is used up")
+                    deferred = True
+                    return None
+                
+                reserved['project'] = channel.project
+                self.quota.pace(channel.project, checkpoint=lambda: self._checkpoint(upload_data, 'upload'))
+                self.journal.update(key, stage='uploading', channel=channel.name)
+                try:
+                    video_id = self.upload_to_youtube(
+                        upload_data.get('video_file'),
+                        upload_data['title'],
+                        upload_data['caption'],
+                        upload_data['privacy'],
+                        tags=upload_data.get('tags'),
+                        resume_uri=upload_data.get('upload_uri'),
+                        on_session=lambda uri: self.journal.update(key, upload_uri=uri),
+                        progress=self._upload_progress_logger(key=key),
+                        checkpoint=checkpoint,
+                        channel=channel,
+                        stream=upload_data.get('stream'),
+                        stats=stats
+                    )
+                except Exception as e:
+                    if not is_quota_error(e):
+                        raise
+                    # Spent for today; another channel may still have budget
+                    self.quota.exhaust(channel.project)
+                    reserved.pop('project', None)
+                    upload_data.pop('routed_channel', None)
+                    upload_data['upload_uri'] = None
+                    continue
+                break
+            
+            self.journal.update(key, stage='done', video_id=video_id)
+            record.update(
+                channel=channel.name, video_id=video_id, upload_bytes=stats.get('bytes'),
+                upload_retries=stats.get('retries', 0))
+            if stats.get('bytes') and stats.get('seconds'):
+                record['upload_bytes_per_second'] = stats['bytes'] / stats['seconds']
+                self.metrics.inc("shorts_upload_bytes_total", stats['bytes'], channel=channel.name)
+            self.metrics.inc("shorts_upload_retries_total", stats.get('retries', 0), channel=channel.name)
+            self._finish_job(upload_data, 'done')
+            if upload_data.get('fingerprint'):
+                try:
+                    self.fingerprint_index().commit(upload_data['fingerprint'], upload_data['url'], video_id)
+                except Exception as e:
+                    self.logger.log(f"Could not record the fingerprint of {upload_data['url']}: {str(e)}", "WARNING")
+            self.logger.log(f"✅ Upload successful! Video ID: {video_id} (channel {channel.name})", "SUCCESS")
+        except Exception as e:
+            if 'project' in reserved:
+                # Cancelled or failed before the insert went out: nothing was spent
+                self.quota.release(reserved['project'])
+            if not upload_data['cancel'].cancelled:
+                self.journal.update(key, stage='failed', error=str(e))
+            raise
+        finally:
+            if not deferred:
+                self._discard_download(upload_data)
+
+    def active_channels(self):
+        """Return the channels that are logged in and can take uploads."""
+        return [channel for channel in self.channels if channel.credentials]
+
+    def _reserve_channel(self, upload_data):
+        """Pick the channel for a job and reserve one upload of quota on it.
+
+        Jobs tagged with a ``channel`` (or bound to one by an open upload
+        session) only go there; others go to the channel whose project has
+        the most quota left. Returns None when no eligible channel has
+        budget left today.
+        """
+        wanted = upload_data.get('routed_channel') or upload_data.get('channel')
+        with self._route_lock:
+            candidates = self.active_channels()
+            if wanted:
+                candidates = [channel for channel in candidates if channel.name == wanted]
+                if not candidates:
+                    raise Exception(f"Channel {wanted!r} is not configured or not logged in")
+            candidates.sort(key=lambda channel: self.quota.remaining(channel.project), reverse=True)
+            for channel in candidates:
+                if self.quota.reserve(channel.project):
+                    return channel
+        return None
+
+    def _defer(self, upload_data, reason):
+        """Park a job until the next quota reset, keeping its clean file for the retry."""
+        until = self.quota.next_reset()
+        self.journal.update(
+            upload_data['journal_key'], stage='deferred', not_before=until,
+            video_file=upload_data.get('video_file'), upload_uri=None, channel=None)
+        self.logger.log(
+            f"⏸ Deferred {upload_data['url']} until {self._format_time(until)}: {reason}", "WARNING")
+        self._finish_job(upload_data, 'deferred', reason)
+        self._schedule_deferred_resume(until)
+
+    def _schedule_deferred_resume(self, when):
+        """Arrange for deferred jobs to be queued again at ``when`` (epoch seconds)."""
+        with self._processing_lock:
+            if self._resume_at is not None and self._resume_at <= when:
+                return
+            if self._resume_timer is not None:
+                self._resume_timer.cancel()
+            self._resume_at = when
+            self._resume_timer = threading.Timer(max(0, when - time.time()) + 1, self.resume_deferred_jobs)
+            self._resume_timer.daemon = True
+            self._resume_timer.start()
+
+    def resume_deferred_jobs(self):
+        """Queue deferred jobs whose quota window has reopened."""
+        with self._processing_lock:
+            self._resume_timer = None
+            self._resume_at = None
+        due = self.journal.due_deferred()
+        if due:
+            self.logger.log(f"Quota window reopened, resuming {len(due)} deferred jobs...", "INFO")
+            for upload_data in due:
+                self.upload_queue.put(upload_data)
+            self.start_processing()
+        upcoming = self.journal.next_deferred()
+        if upcoming is not None and upcoming > time.time():
+            self._schedule_deferred_resume(upcoming)
+        return len(due)
+
+    def _format_time(self, when):
+        return datetime.fromtimestamp(when).strftime('%Y-%m-%d %H:%M')
+
+    def _upload_progress_logger(self, step=25, key=None):
+        """Return a progress callback that logs every ``step`` percent with the current speed.
+
+        Every call is also published to ``progress`` for job ``key``.
+        """
+        started = time.monotonic()
+        state = {'next': step}
+
+        def report(sent, total):
+            rate = sent / max(time.monotonic() - started, 1e-6)
+            speed = rate / (1024 * 1024)
+            if total is None:
+                # Streams have no known size until they end
+                self.progress.publish(key, upload=None, speed=rate, eta=None)
+                self.logger.log(f"Uploaded {sent / (1024 * 1024):.1f} MB ({speed:.1f} MB/s)")
+                return
+            self.progress.publish(
+                key, upload=sent * 100 / total if total else 100.0, speed=rate,
+                eta=(total - sent) / rate if rate else None)
+            percent = sent * 100 // total if total else 100
+            if percent >= state['next'] or sent == total:
+                state['next'] = (percent // step + 1) * step
+                self.logger.log(f"Uploaded {percent}% ({speed:.1f} MB/s)")
+        return report
+
+    def _stage_failed(self, stage, upload_data, error):
+        """Log a failed item and release anything it left on disk."""
+        if upload_data.get('cancel') and upload_data['cancel'].cancelled:
+            # Whatever the cancelled download, encode or upload raised
+            self._cancelled(upload_data)
+            return
+        self.logger.log(f"❌ Error processing {upload_data['url']} ({stage}): {str(error)}", "ERROR")
+        self._finish_job(upload_data, 'failed', f"{stage}: {str(error)}")
+        if upload_data.get('fingerprint'):
+            # Let a later copy of this clip through, since this one never made it
+            self.fingerprint_index().release(upload_data['fingerprint'], upload_data['url'])
+        if stage != "upload":
+            if upload_data.get('journal_key'):
+                self.journal.update(upload_data['journal_key'], stage='failed', error=str(error))
+            self._discard_download(upload_data)
+
+    def _discard_download(self, upload_data):
+        # Clean up downloaded file if it's not a local file
+        video_file = upload_data.get('video_file')
+        if upload_data['source'] != "Local File" and video_file and os.path.exists(video_file):
+            os.remove(video_file)
+
+    def _youtube_client(self, channel=None):
+        """Return a YouTube client for ``channel`` owned by the calling thread.
+
+        The httplib2 transport behind the client is not thread-safe, so every
+        upload worker builds its own client per channel from the shared
+        credentials.
+        """
+        clients = getattr(self._thread_local, 'youtube_clients', None)
+        if clients is None:
+            clients = self._thread_local.youtube_clients = {}
+        name = channel.name if channel else None
+        client = clients.get(name)
+        if client is None:
+            client = self.build_client(channel.credentials if channel else self.credentials)
+            clients[name] = client
+        return client
+
+    def build_client(self, credentials):
+        """Build a YouTube API client from the locally cached discovery document."""
+        from googleapiclient.discovery import build_from_document
+        
+        if self.discovery_document is None:
+            self.discovery_document = self._load_discovery_document()
+        return build_from_document(self.discovery_document, credentials=credentials)
+
+    def _load_discovery_document(self):
+        """Return the discovery document from the local cache, filling the cache on first use."""
+        try:
+            with open(self.discovery_cache_file, encoding='utf-8') as cached:
+                return cached.read()
+        except FileNotFoundError:
+            pass
+        
+        document = None
+        try:
+            # google-api-python-client 2.x bundles every discovery document
+            from googleapiclient.discovery_cache import get_static_doc
+            document = get_static_doc(self.api_service_name, self.api_version)
+        except ImportError:
+            pass
+        if document is None:
+            import urllib.request
+            self.logger.log("Fetching API discovery document (one time)...")
+            url = f"https://www.googleapis.com/discovery/v1/apis/{self.api_service_name}/{self.api_version}/rest"
+            with urllib.request.urlopen(url, timeout=30) as response:
+                document = response.read().decode('utf-8')
+        
+        os.makedirs(os.path.dirname(self.discovery_cache_file) or ".", exist_ok=True)
+        partial_path = f"{self.discovery_cache_file}.{uuid.uuid4()}.part"
+        with open(partial_path, "w", encoding='utf-8') as cached:
+            cached.write(document)
+        os.replace(partial_path, self.discovery_cache_file)
+        return document
+
+    def upload_to_youtube(self, video_file, title, caption, privacy_status, resume_uri=None,
+                          on_session=None, progress=None, http=None, channel=None, stream=None,
+                          stats=None, tags=None, checkpoint=None):
+        """Upload video to YouTube as a Short, tagged with ``tags`` (default: "Short").
+
+        ``resume_uri`` continues an earlier resumable session from the byte
+        offset the server acknowledged; ``on_session`` is called with the
+        session URI as soon as the server hands one out. ``progress`` gets
+        ``(bytes_sent, total_bytes)`` after each chunk, and ``http``
+        overrides the transport used for the upload requests. ``channel``
+        selects the account to upload as (default: the first logged-in one).
+        With ``stream`` (see :func:`media.progressive_format`) the remote
+        file is remuxed through a pipe and uploaded instead of ``video_file``.
+        ``stats``, if given, is filled with the ``bytes`` sent, the
+        ``seconds`` the transfer took and the chunk ``retries``.
+        ``checkpoint`` is called before every chunk (see ChunkedUploader).
+        """
+        from googleapiclient.errors import HttpError
+        from googleapiclient.http import MediaFileUpload
+        
+        try:
+            self.logger.log("Preparing upload to YouTube...")
+            
+            body = {
+                'snippet': {
+                    'title': title or f"Short - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                    'description': caption,
+                    'tags': tags or ['Short'],
+                    'categoryId': '22'
+                },
+                'status': {
+                    'privacyStatus': privacy_status,
+                    'selfDeclaredMadeForKids': False
+                }
+            }
+            
+            max_chunk_size = None
+            if stream is not None:
+                from .streaming import PipeMediaUpload, stream_remux_command
+                max_chunk_size = self.stream_max_chunk_size
+                media = PipeMediaUpload(
+                    stream_remux_command(stream),
+                    chunksize=min(self.upload_chunk_size, max_chunk_size),
+                    buffer_size=self.stream_buffer_size
+                )
+            else:
+                media = MediaFileUpload(
+                    video_file,
+                    mimetype='video/*',
+                    chunksize=self.upload_chunk_size,
+                    resumable=True
+                )
+            
+            request = self._youtube_client(channel).videos().insert(
+                part=','.join(body.keys()),
+                body=body,
+                media_body=media
+            )
+            
+            if resume_uri:
+                self.logger.log("Resuming interrupted upload...")
+                # With the error flag set, next_chunk first asks the server
+                # which bytes it already holds and continues from there.
+                request.resumable_uri = resume_uri
+                request._in_error_state = True
+            else:
+                self.logger.log("Uploading video...")
+            
+            uploader = ChunkedUploader(
+                adaptive=self.upload_adaptive_chunks,
+                max_retries=self.upload_max_retries,
+                progress=progress,
+                on_session=on_session,
+                http=http,
+                checkpoint=checkpoint
+            )
+            if max_chunk_size:
+                uploader.max_chunk_size = max_chunk_size
+            started = time.monotonic()
+            try:
+                response = uploader.run(request)
+            except HttpError as e:
+                if resume_uri and e.resp.status in (404, 410):
+                    self.logger.log("Upload session expired, starting over", "WARNING")
+                    return self.upload_to_youtube(
+                        video_file, title, caption, privacy_status,
+                        on_session=on_session, progress=progress, http=http, channel=channel,
+                        stream=stream, stats=stats, tags=tags, checkpoint=checkpoint)
+                raise
+            finally:
+                if stats is not None:
+                    stats['retries'] = stats.get('retries', 0) + uploader.retries
+                if stream is not None:
+                    media.close()
+            
+            if stats is not None:
+                stats['seconds'] = time.monotonic() - started
+                stats['bytes'] = media.total_size if stream is not None else os.path.getsize(video_file)
+            
+            if uploader.retries:
+                self.logger.log(f"Upload needed {uploader.retries} retries", "WARNING")
+            self.logger.log("Upload completed successfully!", "SUCCESS")
+            return response['id']
+            
+        except Exception as e:
+            self.logger.log(f"Upload failed: {str(e)}", "ERROR")
+            raise
+
+    def clean_metadata(self, video_path, job=None):
+        """Remove metadata from video file, remuxing instead of re-encoding when possible.
+
+        The path taken ("remux" or "reencode") is logged and, when ``job`` is
+        given, stored in ``job['clean_path']``; the job's cancel token stops
+        the encode.
+        """
+        cancel = job.get('cancel') if job else None
+        try:
+            self.logger.log("Cleaning video metadata...")
+            
+            method = "reencode"
+            info = None
+            try:
+                info = probe_media(video_path)
+            except Exception as e:
+                self.logger.log(f"Probe failed, falling back to re-encode: {str(e)}", "WARNING")
+            if self.clean_mode == 'auto' and info is not None:
+                if self.is_remux_compatible(info):
+                    method = "remux"
+                else:
+                    self.logger.log(
+                        f"Re-encoding {os.path.basename(video_path)}: "
+                        f"{info.get('video_codec')}/{info.get('audio_codec')} is not stream-copyable",
+                        "WARNING")
+            
+            clean_path = None
+            if method == "remux":
+                clean_path = self._remux_clean(video_path, cancel)
+            elif self._segment_plan(info):
+                try:
+                    clean_path = self._segmented_clean(video_path, info, job)
+                    if clean_path is not None:
+                        method = "segmented"
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    self.logger.log(f"Segmented encode failed, encoding in one piece: {str(e)}", "WARNING")
+            if clean_path is None:
+                clean_path = self._reencode_clean(video_path, cancel)
+            
+            if job is not None:
+                job['clean_path'] = method
+            self.logger.log(f"Metadata cleaning completed ({method})")
+            return clean_path
+            
+        except JobCancelled:
+            raise
+        except Exception as e:
+            self.logger.log(f"Error cleaning metadata: {str(e)}", "ERROR")
+            raise
+
+    def _reencode_clean(self, video_path, cancel=None):
+        """Strip metadata by fully re-encoding the video in the transcode pool."""
+        from concurrent.futures import wait
+        
+        clean_filename = os.path.join(
+            os.path.dirname(video_path),
+            f"clean_{str(uuid.uuid4())}{os.path.splitext(video_path)[1]}"
+        )
+        # The worker process polls for this file to learn of a cancel
+        cancel_path = clean_filename + ".cancel"
+        
+        _, threads = self._transcode_plan()
+        future = self._transcode_pool().submit(
+            transcode_video, os.path.abspath(video_path), os.path.abspath(clean_filename), threads,
+            os.path.abspath(cancel_path) if cancel else None)
+        with self._transcode_lock:
+            self._pool_encodes += 1
+        try:
+            while cancel is not None and not wait([future], timeout=0.5).done:
+                if cancel.cancelled and not os.path.exists(cancel_path):
+                    if future.cancel():
+                        cancel.check()
+                    open(cancel_path, "w").close()
+            future.result()
+        except Exception:
+            if os.path.exists(clean_filename):
+                os.remove(clean_filename)
+            raise
+        finally:
+            with self._transcode_lock:
+                self._pool_encodes -= 1
+            if os.path.exists(cancel_path):
+                os.remove(cancel_path)
+        
+        if os.path.exists(video_path):
+            os.remove(video_path)
+        os.rename(clean_filename, video_path)
+        return video_path
+
+    def _segment_plan(self, info):
+        """Return (workers, segment seconds) if ``info`` warrants a segmented encode, else None."""
+        cores = self._free_cores()
+        if not self.segment_encode or not info or not info.get('duration') or cores < 2:
+            return None
+        pixels = (info.get('width') or 0) * (info.get('height') or 0)
+        if info['duration'] < self.segment_min_duration and pixels <= self.segment_min_pixels:
+            return None
+        # About two segments per core evens out segments of unequal cost
+        return cores, max(2.0, info['duration'] / (cores * 2))
+
+    def _segmented_clean(self, video_path, info, job=None):
+        """Strip metadata by re-encoding keyframe-aligned segments in parallel.
+
+        Returns None, leaving the clip to the transcode pool, if the pool's
+        encodes have taken all but one core by the time this clip's turn comes.
+        """
+        clean_filename = os.path.join(
+            os.path.dirname(video_path),
+            f"clean_{str(uuid.uuid4())}.mp4"
+        )
+        with self._segment_lock:
+            plan = self._segment_plan(info)
+            if plan is None:
+                return None
+            workers, segment_seconds = plan
+            self.logger.log(
+                f"Encoding {os.path.basename(video_path)} in {segment_seconds:.0f}s segments on {workers} cores...")
+            started = time.monotonic()
+            checksum = segmented_transcode(
+                os.path.abspath(video_path), os.path.abspath(clean_filename), workers, segment_seconds,
+                cancel=job.get('cancel') if job else None)
+        self.logger.log(
+            f"Segmented encode took {time.monotonic() - started:.1f}s, frame count and duration verified "
+            f"(sha256 {checksum[:16]})")
+        if job is not None:
+            job['clean_sha256'] = checksum
+        
+        output_path = os.path.splitext(video_path)[0] + ".mp4"
+        if os.path.exists(video_path):
+            os.remove(video_path)
+        os.replace(clean_filename, output_path)
+        return output_path
+
+    def _free_cores(self):
+        """Return the cores not claimed by encodes submitted to the transcode pool."""
+        _, threads = self._transcode_plan()
+        with self._transcode_lock:
+            busy = self._pool_encodes * threads
+        return max(0, available_cores() - busy)
+
+    def _transcode_plan(self):
+        """Return (pool size, encoder threads per job) for the available cores."""
+        cores = available_cores()
+        if self.transcode_workers:
+            workers = self.transcode_workers
+            threads = max(1, cores // workers)
+        else:
+            threads = max(1, min(self.transcode_threads, cores))
+            workers = max(1, cores // threads)
+        return workers, threads
+
+    def _transcode_pool(self):
+        with self._transcode_lock:
+            if self._transcode_executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                workers, threads = self._transcode_plan()
+                self._transcode_executor = ProcessPoolExecutor(max_workers=workers)
+                self.logger.log(f"Transcode pool: {workers} processes x {threads} encoder threads")
+            return self._transcode_executor
+
+    def _shutdown_transcode_pool(self):
+        with self._transcode_lock:
+            if self._transcode_executor is not None:
+                self._transcode_executor.shutdown(wait=True)
+                self._transcode_executor = None
+
+    def _remux_clean(self, video_path, cancel=None):
+        """Strip container and stream metadata with a stream copy into MP4."""
+        clean_filename = os.path.join(
+            os.path.dirname(video_path),
+            f"clean_{str(uuid.uuid4())}.mp4"
+        )
+        command = [
+            ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-y',
+            '-i', video_path,
+            '-map', '0:v:0', '-map', '0:a:0?',
+            '-c', 'copy',
+            '-map_metadata', '-1',
+            '-map_metadata:s:v', '-1',
+            '-map_metadata:s:a', '-1',
+            '-map_chapters', '-1',
+            '-fflags', '+bitexact',
+            '-flags:v', '+bitexact',
+            '-flags:a', '+bitexact',
+            '-movflags', '+faststart',
+            clean_filename
+        ]
+        try:
+            result = run_command(command, cancel)
+        except JobCancelled:
+            if os.path.exists(clean_filename):
+                os.remove(clean_filename)
+            raise
+        if result.returncode != 0:
+            if os.path.exists(clean_filename):
+                os.remove(clean_filename)
+            raise Exception(f"Remux failed: {result.stderr.strip()[-500:]}")
+        
+        output_path = os.path.splitext(video_path)[0] + ".mp4"
+        if os.path.exists(video_path):
+            os.remove(video_path)
+        os.replace(clean_filename, output_path)
+        return output_path
+
+    def is_remux_compatible(self, info):
+        """Return True if ``info`` can be stream-copied into an MP4 YouTube accepts."""
+        return (
+            info.get('video_codec') in REMUX_VIDEO_CODECS
+            and info.get('audio_codec') in REMUX_AUDIO_CODECS
+            and bool(REMUX_CONTAINERS.intersection(info.get('format_names', [])))
+        )
+    
+    def clean_title(self, title):
+        """Remove hashtags and clean title."""
+        title = re.sub(r'#\w+', '', title)
+        title = re.sub(r'\s+', ' ', title)
+        title = title.strip()
+        return title
+    
+    def sanitize_filename(self, filename):
+        """Sanitize filename by removing invalid characters and limiting length."""
+        filename = "".join(char for char in filename if char.isalnum() or char in (' ', '-', '_', '.'))
+        filename = unicodedata.normalize('NFKD', filename).encode('ASCII', 'ignore').decode('ASCII')
+        if len(filename) > 200:
+            name, ext = os.path.splitext(filename)
+            filename = name[:196] + ext
+        return filename
+
+    def get_safe_filename(self, base_path):
+        """Generate a safe, unique filename."""
+        name, ext = os.path.splitext(base_path)
+        counter = 1
+        while os.path.exists(base_path):
+            base_path = f"{name}_{counter}{ext}"
+            counter += 1
+        return base_path
+
+    def extract_info(self, url, source):
+        """Extract a remote video's metadata with yt-dlp without downloading it."""
+        try:
+            info_dict = self._downloader(source).extract_info(url, download=False)
+        except Exception as e:
+            raise Exception(f"Info extraction failed: {str(e)}")
+        if info_dict is None:
+            raise Exception("Could not extract video info")
+        return info_dict
+
+    def download_video(self, url, source, info_dict=None, job_key=None):
+        """Download video from various sources with a single extraction pass.
+
+        With ``info_dict`` from :meth:`extract_info` the download reuses that
+        metadata instead of extracting the page again. ``job_key`` goes into
+        the file name, so two jobs for one post never share a file.
+        """
+        try:
+            if source == "Local File":
+                self.logger.log("Using local file...")
+                return url
+            
+            self.logger.log(f"Downloading video from {source}...")
+            
+            # Create downloads directory if it doesn't exist
+            os.makedirs("downloads", exist_ok=True)
+
+            try:
+                ydl = self._downloader(source)
+                if info_dict is not None:
+                    info_dict.setdefault('_shorts_job', job_key or uuid.uuid4().hex)
+                    info_dict = ydl.process_ie_result(info_dict, download=True)
+                else:
+                    info_dict = ydl.extract_info(
+                        url, download=True, extra_info={'_shorts_job': job_key or uuid.uuid4().hex})
+                if info_dict is None:
+                    raise Exception("Could not extract video info")
+                
+                video_path = self._downloaded_path(ydl, info_dict)
+                if not video_path or not os.path.isfile(video_path):
+                    raise Exception("Download completed but file not found")
+                
+                self.logger.log(f"Download completed: {video_path}")
+                return video_path
+
+            except Exception as e:
+                raise Exception(f"Download failed: {str(e)}")
+                
+        except Exception as e:
+            self.logger.log(f"Download failed: {str(e)}", "ERROR")
+            raise
+
+    def _downloader(self, source):
+        """Return this thread's YoutubeDL instance for ``source``, creating it once per batch."""
+        downloaders = getattr(self._thread_local, 'downloaders', None)
+        if downloaders is None:
+            downloaders = self._thread_local.downloaders = {}
+        
+        ydl = downloaders.get(source)
+        if ydl is None:
+            # Combine default options with platform-specific options
+            current_opts = self.ydl_opts.copy()
+            if source in self.platform_opts:
+                current_opts.update(self.platform_opts[source])
+            current_opts.setdefault('format', self._format_selector())
+            current_opts['format_sort'] = [
+                f"res:{self.max_download_resolution}", *current_opts.get('format_sort', ())]
+            current_opts.update(
+                concurrent_fragment_downloads=self.fragment_downloads,
+                ffmpeg_location=ffmpeg_binary(),
+                progress_hooks=[self._download_progress])
+            import yt_dlp
+            ydl = yt_dlp.YoutubeDL(current_opts)
+            downloaders[source] = ydl
+            with self._downloaders_lock:
+                self._open_downloaders.append(ydl)
+        return ydl
+
+    def _format_selector(self):
+        """Return the yt-dlp format spec: H.264/AAC above the quality floor first, then anything."""
+        floor = f"[width>=?{self.min_remux_resolution}][height>=?{self.min_remux_resolution}]"
+        h264, aac = "[vcodec~='^(avc|h264)']", "[acodec~='^(mp4a|aac)']"
+        if self.streaming:
+            # Only single files can be streamed into the upload
+            return f"b{h264}{aac}{floor}/b/bv*+ba"
+        return f"bv*{h264}{floor}+ba{aac}/b{h264}{aac}{floor}/bv*+ba/b"
+
+    def _download_progress(self, status):
+        """yt-dlp progress hook: apply pause and cancel, then publish the job's percent, speed and ETA."""
+        key = (status.get('info_dict') or {}).get('_shorts_job') or getattr(self._thread_local, 'progress_key', None)
+        if key is None:
+            return
+        with self._jobs_lock:
+            upload_data = self._jobs.get(key)
+        if upload_data is not None:
+            # Raising here aborts the download; blocking holds it
+            self._checkpoint(upload_data, 'download')
+        if status['status'] == 'downloading':
+            total = status.get('total_bytes') or status.get('total_bytes_estimate')
+            self.progress.publish(
+                key, download=status.get('downloaded_bytes', 0) * 100 / total if total else None,
+                speed=status.get('speed'), eta=status.get('eta'))
+        elif status['status'] == 'finished':
+            self.progress.publish(key, download=100.0, speed=None, eta=None)
+
+    def _close_downloaders(self):
+        with self._downloaders_lock:
+            for ydl in self._open_downloaders:
+                ydl.close()
+            self._open_downloaders = []
+
+    def _downloaded_path(self, ydl, info_dict):
+        """Resolve the downloaded file straight from the info dict yt-dlp returned."""
+        if info_dict.get('_type') in ('playlist', 'multi_video'):
+            entries = [entry for entry in info_dict.get('entries') or [] if entry]
+            if not entries:
+                return None
+            info_dict = entries[0]
+        
+        for download in info_dict.get('requested_downloads') or []:
+            if download.get('filepath'):
+                return download['filepath']
+        return info_dict.get('filepath') or ydl.prepare_filename(info_dict)
+    
+    def authenticate(self, open_browser=True, interactive=True, channel=None):
+        """Authenticate with YouTube API for every configured channel (or just ``channel``).
+
+        Saved credentials are reused and refreshed silently; see
+        :meth:`Channel.authenticate`. A channel that cannot log in is
+        skipped with a warning as long as at least one other one can.
+        """
+        self.logger.log("Starting YouTube authentication...")
+        
+        self.load_channels()
+        targets = [c for c in self.channels if channel is None or c.name == channel]
+        if not targets:
+            raise Exception(f"Unknown channel {channel!r}")
+        
+        for target in targets:
+            try:
+                target.authenticate(self.SCOPES, self.logger, open_browser=open_browser, interactive=interactive)
+            except Exception as e:
+                if len(targets) == 1:
+                    raise
+                self.logger.log(f"Channel {target.name} is unavailable: {str(e)}", "WARNING")
+        
+        active = self.active_channels()
+        if not active:
+            raise Exception("No channel could be authenticated")
+        self.credentials = active[0].credentials
+        self.youtube = self.build_client(self.credentials)
+        
+        names = ", ".join(c.name for c in active)
+        self.logger.log(f"Authentication successful! Channels: {names}", "SUCCESS")
+
+    def load_channels(self):
+        """Read the channel list once, falling back to the single token_file account."""
+        if not self.channels:
+            self.channels = load_channels(self.channels_file, self.token_file, self.client_secrets_file)
+        return self.channels
+
+    def has_saved_credentials(self):
+        return any(channel.has_saved_credentials() for channel in self.load_channels())
@@ -0,0 +1,44 @@
+"""Per-job progress events for user interfaces."""
+
+import threading
+
+class ProgressBus:
+    """Coalesce per-job progress published by worker threads for a UI to poll.
+
+    Workers call ``publish(key, field=value, ...)`` as often as they like,
+    e.g. once per downloaded fragment or uploaded chunk. Updates to a job
+    are merged into one pending change until the UI calls :meth:`drain`,
+    so a UI that drains N times a second handles at most N updates per job
+    per second however chatty the workers are. Nothing is kept until
+    :meth:`subscribe` is called, so runs without a UI only pay for a flag
+    check.
+
+    Fields published by :class:`ShortsEngine` are ``url``, ``title``,
+    ``stage`` (a pipeline stage or the job's outcome), ``download`` and
+    ``upload`` (percent, None while unknown), ``speed`` (bytes/second) and
+    ``eta`` (seconds).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.active = False
+
+    def subscribe(self):
+        self.active = True
+
+    def publish(self, key, **fields):
+        if not self.active or key is None:
+            return
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = fields
+            else:
+                pending.update(fields)
+
+    def drain(self):
+        """Return ``{key: fields}`` with every field changed since the last call, in first-published order."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
@@ -0,0 +1,278 @@
+"""Perceptual fingerprints of clips and an index for near-duplicate lookups."""
+
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+
+from .media import ffmpeg_binary, ffmpeg_input_args, probe_media
+
+FRAME_SIZE = 32  # frames are downscaled to 32x32 grey before hashing
+HASH_SIZE = 8    # the top-left 8x8 DCT coefficients give 64 bits per frame
+AUDIO_RATE = 8000
+AUDIO_SECONDS = 30
+AUDIO_BITS = 64
+
+if hasattr(int, 'bit_count'):
+    def hamming(a, b):
+        return (a ^ b).bit_count()
+else:  # Python < 3.10
+    def hamming(a, b):
+        return bin(a ^ b).count("1")
+
+def encode_fingerprint(fingerprint):
+    """Serialize a ``(video_hash, audio_hash)`` pair as ``"videohex:audiohex"``."""
+    video_hash, audio_hash = fingerprint
+    return f"{video_hash:x}:{'' if audio_hash is None else format(audio_hash, 'x')}"
+
+def decode_fingerprint(text):
+    """Inverse of :func:`encode_fingerprint`."""
+    video_hex, _, audio_hex = text.partition(':')
+    return int(video_hex, 16), int(audio_hex, 16) if audio_hex else None
+
+def _dct_matrix(size):
+    import numpy as np
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size)) * np.sqrt(2.0 / size)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+def frame_hashes(frames):
+    """Return one 64-bit DCT perceptual hash per frame of a (n, 32, 32) grey array."""
+    import numpy as np
+    dct = _dct_matrix(FRAME_SIZE)
+    coefficients = dct @ frames.astype(np.float64) @ dct.T
+    low = coefficients[:, :HASH_SIZE, :HASH_SIZE].reshape(len(frames), -1)
+    # Compare against the median of the AC terms so the DC term does not
+    # dominate, then pack each frame's 64 bits into an integer.
+    medians = np.median(low[:, 1:], axis=1, keepdims=True)
+    bits = (low > medians).astype(np.uint8)
+    packed = np.packbits(bits, axis=1)
+    return [int.from_bytes(row.tobytes(), "big") for row in packed]
+
+def _input_args(video_path, stream):
+    return ffmpeg_input_args(stream) if stream else ['-i', video_path]
+
+def video_fingerprint(video_path, frames=4, stream=None):
+    """Hash ``frames`` evenly spaced frames of a clip into one ``64 * frames``-bit integer.
+
+    Each frame comes from its own ffmpeg opened with ``-ss`` before the
+    input, so it seeks to the nearest keyframe and decodes a single frame
+    instead of the whole clip; a ``stream`` (see
+    :func:`media.progressive_format`) is read with range requests around
+    those points instead of ``video_path``. The samples run concurrently.
+    """
+    import numpy as np
+    if stream:
+        duration = stream['duration'] or 60.0
+    else:
+        duration = probe_media(video_path).get('duration') or 1.0
+    processes = [
+        subprocess.Popen(
+            [ffmpeg_binary(), '-hide_banner', '-loglevel', 'error',
+             '-ss', f"{duration * (index + 0.5) / frames:.3f}", *_input_args(video_path, stream),
+             '-map', '0:v:0', '-frames:v', '1',
+             '-vf', f"scale={FRAME_SIZE}:{FRAME_SIZE}:flags=area,format=gray", '-f', 'rawvideo', 'pipe:1'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        for index in range(frames)
+    ]
+    frame_bytes = FRAME_SIZE * FRAME_SIZE
+    sampled, errors = [], []
+    for process in processes:
+        output, error = process.communicate()
+        # A sample seeked past the end of a short clip yields no frame
+        if process.returncode == 0 and len(output) >= frame_bytes:
+            sampled.append(output[:frame_bytes])
+        elif error:
+            errors.append(error.decode(errors='replace').strip())
+    count = len(sampled)
+    if count == 0:
+        raise Exception(f"Could not sample frames: {' '.join(errors)[-300:]}")
+
+    data = np.frombuffer(b"".join(sampled), dtype=np.uint8)
+    hashes = frame_hashes(data.reshape(count, FRAME_SIZE, FRAME_SIZE))
+    # Short clips may yield fewer frames; repeat the last so sizes match
+    hashes += [hashes[-1]] * (frames - count)
+    fingerprint = 0
+    for frame_hash in hashes[:frames]:
+        fingerprint = (fingerprint << 64) | frame_hash
+    return fingerprint
+
+def audio_fingerprint(video_path, stream=None):
+    """Hash the loudness contour of the first seconds of audio, or None without audio.
+
+    The audio is split into ``AUDIO_BITS + 1`` windows and each bit records
+    whether a window is louder than the one before, which survives
+    re-encoding and volume changes.
+    """
+    import numpy as np
+    result = subprocess.run(
+        [ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', *_input_args(video_path, stream),
+         '-t', str(AUDIO_SECONDS), '-vn', '-ac', '1', '-ar', str(AUDIO_RATE),
+         '-f', 's16le', 'pipe:1'],
+        capture_output=True)
+    samples = np.frombuffer(result.stdout[:len(result.stdout) // 2 * 2], dtype=np.int16)
+    windows = AUDIO_BITS + 1
+    if result.returncode != 0 or len(samples) < windows * 256:
+        return None
+
+    samples = samples[:len(samples) // windows * windows].astype(np.float64)
+    energy = np.sqrt(np.mean(samples.reshape(windows, -1) ** 2, axis=1))
+    if not energy.any():
+        return None
+    bits = (energy[1:] > energy[:-1]).astype(np.uint8)
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+class MultiIndexHash:
+    """Index of integer hashes for Hamming-distance lookups by multi-index hashing.
+
+    Hashes of ``bits`` bits are cut into ``max_distance + 1`` blocks. Two
+    hashes at most ``max_distance`` bits apart must then agree exactly on
+    at least one block, so a search only compares the entries that share a
+    block with the key, found in one dict bucket per block.
+
+    :meth:`add` must not run concurrently with itself; searches may run
+    alongside it and see an entry either fully or not at all.
+    """
+
+    def __init__(self, bits, max_distance):
+        self.max_distance = max_distance
+        count = max(1, min(bits, max_distance + 1))
+        self._blocks = []
+        shift = 0
+        for index in range(count):
+            width = bits // count + (1 if index < bits % count else 0)
+            self._blocks.append((shift, (1 << width) - 1))
+            shift += width
+        self._buckets = [{} for _ in self._blocks]
+        self._entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, key, value):
+        self._entries.append((key, value))
+        index = len(self._entries) - 1
+        for (shift, mask), buckets in zip(self._blocks, self._buckets):
+            buckets.setdefault((key >> shift) & mask, []).append(index)
+
+    def search(self, key, max_distance=None, start=0):
+        """Return ``(distance, value)`` pairs within ``max_distance`` of ``key``, closest first.
+
+        ``max_distance`` may not exceed the index's; only entries added as
+        number ``start`` or later are considered.
+        """
+        max_distance = self.max_distance if max_distance is None else max_distance
+        candidates = set()
+        for (shift, mask), buckets in zip(self._blocks, self._buckets):
+            candidates.update(buckets.get((key >> shift) & mask, ()))
+        matches = []
+        for index in candidates:
+            if index < start:
+                continue
+            candidate, value = self._entries[index]
+            distance = hamming(key, candidate)
+            if distance <= max_distance:
+                matches.append((distance, value))
+        return sorted(matches, key=lambda match: match[0])
+
+class FingerprintIndex:
+    """Fingerprints of uploaded clips, persisted in SQLite and searched via multi-index hashing.
+
+    ``claim`` reserves a fingerprint for a job in flight, so a second copy
+    of the same clip in one batch is caught before either is uploaded;
+    ``commit`` persists it once the upload succeeded and ``release`` frees
+    it if the job failed. Searches run without the lock, which is only
+    held to add entries and change their status.
+    """
+
+    def __init__(self, path="state/fingerprints.sqlite3", frames=4, max_video_distance=0.12,
+                 max_audio_distance=0.2):
+        self.frames = frames
+        self.max_video_distance = int(64 * frames * max_video_distance)
+        self.max_audio_distance = int(AUDIO_BITS * max_audio_distance)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "video_hash TEXT NOT NULL, audio_hash TEXT, frames INTEGER NOT NULL, "
+            "video_id TEXT NOT NULL, url TEXT, created REAL NOT NULL)")
+        self._db.commit()
+
+        self._index = MultiIndexHash(64 * frames, self.max_video_distance)
+        rows = self._db.execute(
+            "SELECT video_hash, audio_hash, video_id, url FROM fingerprints WHERE frames = ?",
+            (frames,))
+        for video_hash, audio_hash, video_id, url in rows:
+            entry = {
+                'audio': int(audio_hash, 16) if audio_hash else None,
+                'video_id': video_id,
+                'url': url,
+                'status': 'uploaded'
+            }
+            self._index.add(int(video_hash, 16), entry)
+
+    def fingerprint(self, video_path, stream=None):
+        """Return ``(video_hash, audio_hash)`` for a clip; the audio hash may be None."""
+        return video_fingerprint(video_path, self.frames, stream), audio_fingerprint(video_path, stream)
+
+    def claim(self, fingerprint, url):
+        """Return the entry of a near-duplicate, or reserve ``fingerprint`` and return None.
+
+        A match needs close frames and, when both clips have audio, a close
+        loudness contour too. The returned entry has ``video_id`` (None while
+        the earlier copy is still uploading) and ``url``.
+        """
+        video_hash, audio_hash = fingerprint
+        searched = len(self._index)
+        match = self._first_match(self._index.search(video_hash), audio_hash)
+        if match is not None:
+            return match
+        with self._lock:
+            # Only the claims added while searching are left to check
+            match = self._first_match(self._index.search(video_hash, start=searched), audio_hash)
+            if match is not None:
+                return match
+            self._index.add(video_hash, {'audio': audio_hash, 'video_id': None, 'url': url, 'status': 'pending'})
+            return None
+
+    def _first_match(self, matches, audio_hash):
+        for _, entry in matches:
+            if entry['status'] == 'released':
+                continue
+            if audio_hash is not None and entry['audio'] is not None \
+                    and hamming(audio_hash, entry['audio']) > self.max_audio_distance:
+                continue
+            return entry
+        return None
+
+    def commit(self, fingerprint, url, video_id):
+        """Persist a claimed fingerprint once its clip is uploaded as ``video_id``."""
+        video_hash, audio_hash = fingerprint
+        with self._lock:
+            claimed = False
+            for _, entry in self._index.search(video_hash, 0):
+                if entry['status'] == 'pending' and entry['url'] == url:
+                    entry['status'] = 'uploaded'
+                    entry['video_id'] = video_id
+                    claimed = True
+            if not claimed:
+                # Claimed in an earlier session (a resumed or deferred job)
+                self._index.add(video_hash, {'audio': audio_hash, 'video_id': video_id, 'url': url, 'status': 'uploaded'})
+            self._db.execute(
+                "INSERT INTO fingerprints (video_hash, audio_hash, frames, video_id, url, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (format(video_hash, 'x'), format(audio_hash, 'x') if audio_hash is not None else None,
+                 self.frames, video_id, url, time.time()))
+            self._db.commit()
+
+    def release(self, fingerprint, url):
+        """Drop the claim on a fingerprint whose job did not get uploaded."""
+        video_hash, _ = fingerprint
+        with self._lock:
+            for _, entry in self._index.search(video_hash, 0):
+                if entry['status'] == 'pending' and entry['url'] == url:
+                    entry['status'] = 'released'
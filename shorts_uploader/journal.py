@@ -0,0 +1,118 @@
+"""Crash-safe record of job progress."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class JobJournal:
+    """Durable record of every job's stage, kept in SQLite.
+
+    Jobs are identified by source and URL, plus the ``file_signature`` of
+    a watched file, so a new file dropped under an uploaded one's name is
+    a new job. Besides the stage the journal
+    keeps the working file and the resumable upload session URI, so a batch
+    interrupted by a crash can skip finished items and continue partial
+    uploads where the server left off (on the channel recorded with the
+    session). Jobs parked by the quota scheduler
+    are "deferred" and carry the time (``not_before``) they may run again.
+    The clip's ``fingerprint`` is kept too, so a resumed job still records
+    it once uploaded.
+    """
+
+    UNFINISHED_STAGES = ('queued', 'downloaded', 'cleaned', 'uploading')
+
+    def __init__(self, path="state/journal.sqlite3"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, stage TEXT NOT NULL, "
+            "video_file TEXT, upload_uri TEXT, video_id TEXT, error TEXT, "
+            "updated REAL NOT NULL)")
+        # Columns added after the first release; older journals gain them here
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(jobs)")]
+        for name, kind in (('not_before', 'REAL'), ('channel', 'TEXT'), ('fingerprint', 'TEXT')):
+            if name not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+        self._db.commit()
+
+    @staticmethod
+    def job_key(upload_data):
+        identity = f"{upload_data['source']}\n{upload_data['url']}"
+        if upload_data.get('file_signature'):
+            identity += f"\n{upload_data['file_signature']}"
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+    def begin(self, upload_data):
+        """Register ``upload_data`` and return its journal record.
+
+        Unknown, previously failed, rejected, duplicate and cancelled jobs
+        start over as "queued"; anything else is returned as recorded so the
+        caller can skip or resume it.
+        """
+        key = self.job_key(upload_data)
+        with self._lock:
+            record = self._get(key)
+            if record is None or record['stage'] in ('failed', 'rejected', 'duplicate', 'cancelled'):
+                self._db.execute(
+                    "INSERT OR REPLACE INTO jobs (key, payload, stage, updated) VALUES (?, ?, 'queued', ?)",
+                    (key, json.dumps(upload_data), time.time()))
+                self._db.commit()
+                record = self._get(key)
+            return record
+
+    def update(self, key, **fields):
+        """Record new values for ``fields`` (stage, video_file, upload_uri, ...)."""
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET {columns}, updated = ? WHERE key = ?",
+                (*fields.values(), time.time(), key))
+            self._db.commit()
+
+    def cancel(self, key):
+        """Mark an unfinished or deferred job "cancelled" so it is not resumed; finished ones stay as they are."""
+        placeholders = ", ".join("?" for _ in self.UNFINISHED_STAGES)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET stage = 'cancelled', upload_uri = NULL, updated = ? "
+                f"WHERE key = ? AND stage IN ({placeholders}, 'deferred')",
+                (time.time(), key, *self.UNFINISHED_STAGES))
+            self._db.commit()
+
+    def unfinished(self):
+        """Return the payloads of jobs that were still in flight or are due again, oldest first."""
+        placeholders = ", ".join("?" for _ in self.UNFINISHED_STAGES)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT payload FROM jobs WHERE stage IN ({placeholders}) "
+                "OR (stage = 'deferred' AND not_before <= ?) ORDER BY updated",
+                (*self.UNFINISHED_STAGES, time.time())).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def due_deferred(self):
+        """Return the payloads of deferred jobs whose ``not_before`` has passed."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payload FROM jobs WHERE stage = 'deferred' AND not_before <= ? ORDER BY updated",
+                (time.time(),)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def next_deferred(self):
+        """Return the earliest ``not_before`` among deferred jobs, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(not_before) FROM jobs WHERE stage = 'deferred'").fetchone()
+        return row[0]
+
+    def _get(self, key):
+        cursor = self._db.execute("SELECT * FROM jobs WHERE key = ?", (key,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
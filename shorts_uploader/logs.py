@@ -0,0 +1,55 @@
+"""Loggers for running the engine without the Tk window."""
+
+import json
+import sys
+import threading
+from datetime import datetime
+
+class ConsoleLogger:
+    """Write log lines to a stream (stderr by default), one line per message."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def log(self, message, level="INFO"):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self.stream.write(f"[{timestamp}] [{level}] {message}\n")
+            self.stream.flush()
+
+class JsonLinesLogger:
+    """Append one JSON record per message to ``path`` for later processing.
+
+    Records carry an ISO timestamp, level, message and the logging thread's
+    name. Lines are flushed as they are written so the file can be tailed.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def log(self, message, level="INFO"):
+        record = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'level': level,
+            'thread': threading.current_thread().name,
+            'message': message
+        }
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+class TeeLogger:
+    """Forward every message to each of ``loggers``."""
+
+    def __init__(self, *loggers):
+        self.loggers = loggers
+
+    def log(self, message, level="INFO"):
+        for logger in self.loggers:
+            logger.log(message, level)
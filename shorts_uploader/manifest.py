@@ -0,0 +1,180 @@
+"""Batch manifests: JSONL or CSV files with one upload job per line, read as a stream."""
+
+import csv
+import json
+import re
+from datetime import datetime
+
+SOURCES = ('Instagram', 'Facebook', 'TikTok', 'Local File')
+PRIVACY_STATUSES = ('private', 'unlisted', 'public')
+
+# YouTube's limits for a video's snippet
+MAX_TITLE_LENGTH = 100
+MAX_DESCRIPTION_LENGTH = 5000
+MAX_TAGS_LENGTH = 500
+
+def read_manifest(path, defaults, logger):
+    """Yield one job per line of a JSONL or CSV manifest, filling gaps from ``defaults``.
+
+    ``.csv`` files need a header row; anything else is read as JSONL, each
+    line a JSON object or a bare JSON string URL. The keys (or columns) are
+    ``url`` plus optional ``source``, ``title``, ``description`` (or
+    ``caption``), ``tags``, ``privacy``, ``channel`` and ``priority``
+    (a whole number, higher goes first), and ``max_items``
+    and ``since`` for profile and playlist URLs (see
+    :meth:`ShortsEngine.expand_jobs`, which also numbers the titles). Tags
+    are a JSON list or a comma-separated string.
+
+    The file is read lazily, so a batch starts on the first line however
+    long the manifest is. A line that does not validate is logged with its
+    line number and skipped; the rest of the batch goes on.
+    """
+    defaults = dict(defaults)
+    jobs = errors = 0
+    with open(path, encoding='utf-8-sig', newline='') as manifest:
+        entries = _csv_entries(manifest) if path.lower().endswith('.csv') else _jsonl_entries(manifest)
+        for line_no, entry in entries:
+            try:
+                if isinstance(entry, Exception):
+                    raise entry
+                job = manifest_job(entry, defaults)
+            except ValueError as e:
+                errors += 1
+                logger.log(f"{path}:{line_no}: {str(e)}", "ERROR")
+                continue
+            jobs += 1
+            yield job
+    level = "WARNING" if errors else "INFO"
+    logger.log(f"Manifest {path}: {jobs} jobs read, {errors} lines skipped", level)
+
+def _jsonl_entries(manifest):
+    """Yield ``(line number, entry)``, or an exception in place of an entry that does not parse."""
+    for line_no, line in enumerate(manifest, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f"invalid JSON: {str(e)}")
+            continue
+        yield line_no, {'url': entry} if isinstance(entry, str) else entry
+
+def _csv_entries(manifest):
+    """Yield ``(line number, row)`` for each CSV row, or an exception for a malformed one."""
+    reader = csv.DictReader(manifest, strict=True)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield reader.line_num, ValueError(f"invalid CSV: {str(e)}")
+            continue
+        if None in row:
+            yield reader.line_num, ValueError(f"{len(row[None])} more fields than the header has")
+            continue
+        # Empty cells fall back to the defaults like missing JSON keys
+        entry = {key.strip().lower(): value.strip() for key, value in row.items() if key and value and value.strip()}
+        if entry:
+            yield reader.line_num, entry
+
+def manifest_job(entry, defaults):
+    """Validate one manifest entry and return its job; raise ValueError saying what is wrong."""
+    if not isinstance(entry, dict):
+        raise ValueError("expected a JSON object or a URL string")
+    url = entry.get('url')
+    if url is not None and not isinstance(url, str):
+        raise ValueError(f"url must be text, not {_type_name(url)}")
+    if not url:
+        raise ValueError("missing url")
+
+    source = entry.get('source') or defaults.get('source')
+    if source not in SOURCES:
+        raise ValueError(f"unknown source {source!r}" if source else "missing source")
+    if source != "Local File" and not re.match(r"https?://[^\s]+$", url.strip()):
+        raise ValueError(f"url {url!r} is not an http(s) link")
+
+    title = _text(entry, 'title') or defaults.get('title') or "Short {number}"
+    if len(title) > MAX_TITLE_LENGTH:
+        raise ValueError(f"title is {len(title)} characters long, at most {MAX_TITLE_LENGTH} are allowed")
+    description = _text(entry, 'description')
+    if description is None:
+        description = _text(entry, 'caption')
+    if description is None:
+        description = defaults.get('caption', "")
+    if len(description) > MAX_DESCRIPTION_LENGTH:
+        raise ValueError(
+            f"description is {len(description)} characters long, at most {MAX_DESCRIPTION_LENGTH} are allowed")
+    for name, text in (('title', title), ('description', description)):
+        if '<' in text or '>' in text:
+            raise ValueError(f"{name} may not contain < or >")
+
+    privacy = entry.get('privacy') or defaults.get('privacy') or 'private'
+    if privacy not in PRIVACY_STATUSES:
+        raise ValueError(f"privacy must be one of {', '.join(PRIVACY_STATUSES)}")
+
+    job = {
+        'url': url.strip(),
+        'source': source,
+        'title': title,
+        'caption': description,
+        'privacy': privacy
+    }
+    tags = _tags(entry.get('tags', defaults.get('tags')))
+    if tags:
+        job['tags'] = tags
+    channel = _text(entry, 'channel') or defaults.get('channel')
+    if channel:
+        job['channel'] = channel
+    if entry.get('priority') is not None:
+        job['priority'] = _whole_number(entry, 'priority')
+    if entry.get('max_items') is not None:
+        job['max_items'] = _whole_number(entry, 'max_items')
+        if job['max_items'] < 1:
+            raise ValueError(f"max_items must be at least 1, not {job['max_items']}")
+    if entry.get('since'):
+        try:
+            since = datetime.strptime(str(entry['since']), "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"since must be a YYYY-MM-DD date, not {entry['since']!r}")
+        # strptime also takes "2024-1-5"; store the zero-padded form posts are compared in
+        job['since'] = since.strftime("%Y%m%d")
+    return job
+
+def _type_name(value):
+    return "null" if value is None else type(value).__name__
+
+def _text(entry, name):
+    """Return the text field ``name`` of ``entry``, or None if it is missing or null."""
+    value = entry.get(name)
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{name} must be text, not {_type_name(value)}")
+    return value
+
+def _whole_number(entry, name):
+    """Return the field ``name`` of ``entry`` as an int; CSV cells arrive as strings."""
+    value = entry[name]
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{name} must be a whole number, not {value!r}")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a whole number, not {value!r}")
+
+def _tags(value):
+    """Return a tag list from a list or a comma-separated string, checked against YouTube's limits."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list) or not all(isinstance(tag, str) for tag in value):
+        raise ValueError("tags must be a list of strings or a comma-separated string")
+    tags = [tag.strip() for tag in value if tag.strip()]
+    # YouTube counts a tag with spaces as if it were quoted
+    length = sum(len(tag) + (2 if " " in tag else 0) for tag in tags) + max(len(tags) - 1, 0)
+    if length > MAX_TAGS_LENGTH:
+        raise ValueError(f"tags add up to {length} characters, YouTube allows {MAX_TAGS_LENGTH}")
+    if any('<' in tag or '>' in tag for tag in tags):
+        raise ValueError("tags may not contain < or >")
+    return tags
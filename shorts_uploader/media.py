@@ -0,0 +1,410 @@
+"""Media inspection and re-encoding helpers built on ffmpeg and moviepy."""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from .control import JobCancelled
+
+# Streams that can be copied into an MP4 container as-is and that YouTube
+# ingests without complaint. Anything else goes through a full re-encode.
+REMUX_VIDEO_CODECS = {'h264', 'hevc'}
+REMUX_AUDIO_CODECS = {'aac', 'mp3', None}
+REMUX_CONTAINERS = {'mov', 'mp4', 'm4a', 'matroska', 'webm', 'mpegts', 'flv'}
+
+def ffmpeg_binary():
+    """Return the ffmpeg executable, preferring the one bundled for moviepy."""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg") or "ffmpeg"
+
+def probe_media(video_path):
+    """Read container and stream details from a media file's headers.
+
+    Uses ffprobe when it is on PATH and otherwise parses the banner that
+    ``ffmpeg -i`` prints, so only the headers are read and no frames are
+    decoded. Returns a dict with ``format_names``, ``duration``,
+    ``video_codec``, ``audio_codec``, ``width`` and ``height``. Width and
+    height are as displayed, i.e. swapped for streams rotated by 90 degrees.
+    """
+    info = {
+        'format_names': [],
+        'duration': None,
+        'video_codec': None,
+        'audio_codec': None,
+        'width': None,
+        'height': None
+    }
+    
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-print_format', 'json',
+             '-show_format', '-show_streams', video_path],
+            capture_output=True, text=True)
+        if result.returncode != 0:
+            raise Exception(f"ffprobe failed: {result.stderr.strip()}")
+        data = json.loads(result.stdout or "{}")
+        fmt = data.get('format', {})
+        info['format_names'] = fmt.get('format_name', '').split(',')
+        if fmt.get('duration'):
+            info['duration'] = float(fmt['duration'])
+        for stream in data.get('streams', []):
+            if stream.get('codec_type') == 'video' and info['video_codec'] is None:
+                info['video_codec'] = stream.get('codec_name')
+                info['width'] = stream.get('width')
+                info['height'] = stream.get('height')
+                rotation = stream.get('tags', {}).get('rotate')
+                for side_data in stream.get('side_data_list', []):
+                    rotation = side_data.get('rotation', rotation)
+                if rotation is not None and abs(int(float(rotation))) % 180 == 90:
+                    info['width'], info['height'] = info['height'], info['width']
+            elif stream.get('codec_type') == 'audio' and info['audio_codec'] is None:
+                info['audio_codec'] = stream.get('codec_name')
+        return info
+    
+    # ffmpeg exits non-zero when no output is given, the banner is all we need
+    result = subprocess.run(
+        [ffmpeg_binary(), '-hide_banner', '-i', video_path],
+        capture_output=True, text=True)
+    banner = result.stderr
+    
+    match = re.search(r"Input #0, (.+?), from", banner)
+    if not match:
+        raise Exception(f"Could not read media headers: {banner.strip()[-300:]}")
+    info['format_names'] = match.group(1).split(',')
+    
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", banner)
+    if match:
+        hours, minutes, seconds = match.groups()
+        info['duration'] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    
+    match = re.search(r"Stream #0:\d+.*?: Video: (\w+)(.*)", banner)
+    if match:
+        info['video_codec'] = match.group(1)
+        size = re.search(r", (\d{2,5})x(\d{2,5})", match.group(2))
+        if size:
+            info['width'], info['height'] = int(size.group(1)), int(size.group(2))
+        rotation = re.search(r"rotate\s*:\s*(-?\d+)|rotation of (-?[\d.]+) degrees", banner)
+        if rotation and info['width'] and abs(int(float(rotation.group(1) or rotation.group(2)))) % 180 == 90:
+            info['width'], info['height'] = info['height'], info['width']
+    
+    match = re.search(r"Stream #0:\d+.*?: Audio: (\w+)", banner)
+    if match:
+        info['audio_codec'] = match.group(1)
+    return info
+
+def normalize_codec(codec):
+    """Map codec names from yt-dlp ("avc1.64001F") and ffmpeg ("h264") to one name."""
+    if not codec or codec == 'none':
+        return None
+    codec = codec.lower().split('.')[0]
+    return {
+        'avc1': 'h264', 'avc3': 'h264',
+        'hvc1': 'hevc', 'hev1': 'hevc', 'h265': 'hevc',
+        'vp09': 'vp9', 'av01': 'av1',
+        'mp4a': 'aac'
+    }.get(codec, codec)
+
+def progressive_format(info_dict):
+    """Return the URL and headers of the single file yt-dlp picked, if it can be stream-copied.
+
+    Only progressive HTTP downloads of H.264/HEVC in an MP4 family container
+    qualify; separate video and audio formats, HLS/DASH manifests and other
+    codecs return None and have to go through the download path.
+    """
+    if info_dict.get('_type') in ('playlist', 'multi_video'):
+        entries = [entry for entry in info_dict.get('entries') or [] if entry]
+        info_dict = entries[0] if entries else {}
+    if info_dict.get('requested_formats') or not info_dict.get('url'):
+        return None
+    if info_dict.get('protocol') not in ('http', 'https') or info_dict.get('ext') not in ('mp4', 'm4v', 'mov'):
+        return None
+    if normalize_codec(info_dict.get('vcodec')) not in REMUX_VIDEO_CODECS \
+            or normalize_codec(info_dict.get('acodec')) not in REMUX_AUDIO_CODECS:
+        return None
+    return {
+        'url': info_dict['url'],
+        'http_headers': info_dict.get('http_headers') or {},
+        'duration': info_dict.get('duration')
+    }
+
+def _format_bytes(fmt, duration):
+    """Return a format's size in bytes, estimated from its bitrate if the page did not say."""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if not size and fmt.get('tbr') and duration:
+        size = fmt['tbr'] * 125 * duration  # kbit/s to bytes
+    return size
+
+def _rank(fmt):
+    shorter_side = min(filter(None, (fmt.get('width'), fmt.get('height'))), default=0)
+    return (shorter_side, fmt.get('tbr') or 0)
+
+def format_choice(info_dict):
+    """Compare the formats yt-dlp picked with the ones a plain "best" would have downloaded.
+
+    "best" is approximated as the highest resolution (then bitrate)
+    rendition with both video and audio, or the largest video plus the best
+    audio when the page only offers them apart. Returns a dict with the
+    ``picked_bytes`` and ``baseline_bytes`` (either may be None when the
+    page gives no sizes), whether the baseline differs from the pick
+    (``changed``) and whether it could have been remuxed
+    (``baseline_remuxable``, None if its codec is unknown); or None without
+    a format list.
+    """
+    if info_dict.get('_type') in ('playlist', 'multi_video'):
+        entries = [entry for entry in info_dict.get('entries') or [] if entry]
+        info_dict = entries[0] if entries else {}
+    formats = info_dict.get('formats') or []
+    if not formats:
+        return None
+    duration = info_dict.get('duration')
+
+    picked = info_dict.get('requested_formats') or [info_dict]
+    combined = [f for f in formats if f.get('vcodec') != 'none' and f.get('acodec') != 'none']
+    if combined:
+        baseline = [max(combined, key=_rank)]
+    else:
+        video = [f for f in formats if f.get('vcodec') != 'none']
+        audio = [f for f in formats if f.get('acodec') != 'none']
+        baseline = ([max(video, key=_rank)] if video else []) + \
+            ([max(audio, key=lambda f: f.get('abr') or f.get('tbr') or 0)] if audio else [])
+
+    def total(selection):
+        sizes = [_format_bytes(f, duration) for f in selection]
+        return sum(sizes) if sizes and all(sizes) else None
+
+    video_codecs = [f.get('vcodec') for f in baseline if f.get('vcodec') != 'none']
+    audio_codecs = [f.get('acodec') for f in baseline if f.get('acodec') != 'none']
+    baseline_remuxable = None
+    if video_codecs and video_codecs[0]:
+        baseline_remuxable = (
+            normalize_codec(video_codecs[0]) in REMUX_VIDEO_CODECS
+            and normalize_codec(audio_codecs[0] if audio_codecs else None) in REMUX_AUDIO_CODECS)
+    return {
+        'picked_bytes': total(picked),
+        'baseline_bytes': total(baseline),
+        'changed': {f.get('format_id') for f in picked} != {f.get('format_id') for f in baseline},
+        'baseline_remuxable': baseline_remuxable
+    }
+
+def ffmpeg_input_args(stream):
+    """Return the ffmpeg arguments that open a :func:`progressive_format` stream."""
+    args = []
+    # ffmpeg does not decode compressed transfer encodings
+    headers = {name: value for name, value in stream['http_headers'].items()
+               if name.lower() != 'accept-encoding'}
+    if headers:
+        args += ['-headers', "".join(f"{name}: {value}\r\n" for name, value in headers.items())]
+    return args + ['-i', stream['url']]
+
+def shorts_violations(info, rules):
+    """Return the ways ``info`` breaks the Shorts ``rules`` (empty if it fits).
+
+    ``info`` holds ``duration``, ``width``, ``height`` and ``video_codec``
+    as produced by :func:`probe_media` or taken from yt-dlp's metadata;
+    unknown values never count as violations. ``rules`` may set
+    ``max_duration`` (seconds), ``vertical`` (height must be at least the
+    width) and ``video_codecs`` (allowed normalized codec names).
+    """
+    violations = []
+    duration = info.get('duration')
+    if rules.get('max_duration') and duration and duration > rules['max_duration']:
+        violations.append(f"{duration:.0f}s is longer than {rules['max_duration']}s")
+    
+    width, height = info.get('width'), info.get('height')
+    if rules.get('vertical') and width and height and width > height:
+        violations.append(f"{width}x{height} is landscape")
+    
+    codec = normalize_codec(info.get('video_codec'))
+    if rules.get('video_codecs') and codec and codec not in rules['video_codecs']:
+        violations.append(f"video codec {codec} is not allowed")
+    return violations
+
+def available_cores():
+    """Return the number of CPU cores this process is allowed to run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def transcode_video(video_path, output_path, threads, cancel_path=None):
+    """Re-encode ``video_path`` to libx264/AAC at ``output_path``.
+
+    Runs inside a transcode worker process. All intermediate files live in a
+    private temp directory that is removed afterwards, so concurrent jobs
+    never collide and nothing is left in the working directory. The encode
+    stops with :class:`JobCancelled` at the next frame once a file exists at
+    ``cancel_path``, since a token cannot reach into the worker process.
+    """
+    from moviepy.editor import VideoFileClip
+    
+    logger = None
+    if cancel_path:
+        import proglog
+        
+        class CancelLogger(proglog.ProgressBarLogger):
+            def bars_callback(self, bar, attr, value, old_value=None):
+                if os.path.exists(cancel_path):
+                    raise JobCancelled("encode cancelled")
+        
+        logger = CancelLogger()
+    
+    work_dir = tempfile.mkdtemp(prefix="transcode-")
+    try:
+        work_file = os.path.join(work_dir, "clean" + os.path.splitext(output_path)[1])
+        video = VideoFileClip(video_path)
+        try:
+            video.write_videofile(
+                work_file,
+                codec='libx264',
+                audio_codec='aac',
+                temp_audiofile=os.path.join(work_dir, 'temp-audio.m4a'),
+                remove_temp=True,
+                threads=threads,
+                logger=logger
+            )
+        finally:
+            video.close()
+        shutil.move(work_file, output_path)
+        return output_path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def video_packet_checksums(video_path):
+    """Return (size, CRC) of every packet of the first video stream, without decoding it."""
+    result = subprocess.run(
+        [ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-nostdin', '-i', video_path,
+         '-map', '0:v:0', '-c', 'copy', '-f', 'framecrc', '-'],
+        capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Could not read packets: {result.stderr.strip()[-300:]}")
+    packets = []
+    for line in result.stdout.splitlines():
+        if line.startswith('#'):
+            continue
+        fields = [field.strip() for field in line.split(',')]
+        packets.append((int(fields[4]), fields[5]))
+    return packets
+
+def run_command(command, cancel=None, poll_seconds=0.5):
+    """Run ``command`` like ``subprocess.run(capture_output=True, text=True)``.
+
+    With a :class:`CancelToken` as ``cancel`` the process is killed and
+    :class:`JobCancelled` raised as soon as the token is cancelled.
+    """
+    if cancel is None:
+        return subprocess.run(command, capture_output=True, text=True)
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as process:
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=poll_seconds)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel.cancelled:
+                    process.kill()
+                    process.communicate()
+                    cancel.check()
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+def _run_ffmpeg(args, what, cancel=None):
+    result = run_command(
+        [ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-nostdin', '-y', *args], cancel)
+    if result.returncode != 0:
+        raise Exception(f"{what} failed: {result.stderr.strip()[-500:]}")
+
+def segmented_transcode(video_path, output_path, workers, segment_seconds, threads=1, cancel=None):
+    """Re-encode ``video_path`` to H.264/AAC MP4 by encoding keyframe-aligned segments in parallel.
+
+    The video stream is cut at keyframes with a stream copy, ``workers``
+    ffmpeg processes encode the pieces concurrently while the audio track is
+    encoded whole, and the concat demuxer joins everything with another
+    stream copy. Keeping the audio in one piece and each segment's own
+    timestamps keeps A/V in sync across the joins. The join is checked
+    packet by packet: the output's video packets must match the encoded
+    segments' sizes and CRCs in order, their count the source's frame
+    count, and the duration the source's. Raises otherwise; returns
+    the SHA-256 of the output file. Cancelling ``cancel`` kills every
+    running ffmpeg and raises :class:`JobCancelled`.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    source = probe_media(video_path)
+    work_dir = tempfile.mkdtemp(prefix="segments-")
+    try:
+        _run_ffmpeg(
+            ['-i', video_path, '-map', '0:v:0', '-c', 'copy', '-an',
+             '-f', 'segment', '-segment_time', f"{segment_seconds:.3f}", '-reset_timestamps', '1',
+             os.path.join(work_dir, "part-%05d.mkv")],
+            "Splitting", cancel)
+        parts = sorted(name for name in os.listdir(work_dir) if name.startswith("part-"))
+        if not parts:
+            raise Exception("Splitting produced no segments")
+        
+        def encode(name):
+            encoded = os.path.join(work_dir, f"encoded-{os.path.splitext(name)[0]}.mp4")
+            _run_ffmpeg(
+                ['-i', os.path.join(work_dir, name), '-map', '0:v:0', '-map_metadata', '-1',
+                 '-c:v', 'libx264', '-preset', 'medium', '-crf', '23', '-pix_fmt', 'yuv420p',
+                 '-fps_mode', 'passthrough', '-threads', str(threads), encoded],
+                f"Encoding {name}", cancel)
+            return encoded
+        
+        def encode_audio():
+            audio = os.path.join(work_dir, "audio.m4a")
+            _run_ffmpeg(
+                ['-i', video_path, '-map', '0:a:0', '-vn', '-map_metadata', '-1',
+                 '-c:a', 'aac', '-b:a', '192k', audio],
+                "Encoding audio", cancel)
+            return audio
+        
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            audio_future = pool.submit(encode_audio) if source['audio_codec'] else None
+            encoded = list(pool.map(encode, parts))
+            audio = audio_future.result() if audio_future else None
+        
+        concat_list = os.path.join(work_dir, "concat.txt")
+        with open(concat_list, "w", encoding='utf-8') as listing:
+            for path in encoded:
+                listing.write(f"file '{os.path.basename(path)}'\n")
+        joined = os.path.join(work_dir, "joined.mp4")
+        inputs = ['-f', 'concat', '-safe', '0', '-i', concat_list]
+        maps = ['-map', '0:v:0']
+        if audio:
+            inputs += ['-i', audio]
+            maps += ['-map', '1:a:0']
+        _run_ffmpeg(
+            [*inputs, *maps, '-c', 'copy', '-map_metadata', '-1', '-movflags', '+faststart', joined],
+            "Joining segments", cancel)
+        
+        # The concat demuxer puts each segment's parameter sets in-band in its
+        # first keyframe, so only those packets may differ from the segments.
+        joined_packets = video_packet_checksums(joined)
+        segment_packets = []
+        for path in encoded:
+            segment_packets += [None] + video_packet_checksums(path)[1:]
+        if len(joined_packets) != len(segment_packets) or any(
+                expected is not None and expected != packet
+                for expected, packet in zip(segment_packets, joined_packets)):
+            raise Exception("Joined video does not match its encoded segments")
+        source_frames = len(video_packet_checksums(video_path))
+        if len(joined_packets) != source_frames:
+            raise Exception(f"Joined video has {len(joined_packets)} frames, the source {source_frames}")
+        duration = probe_media(joined)['duration']
+        if source['duration'] and duration is not None \
+                and abs(duration - source['duration']) > max(0.5, source['duration'] * 0.01):
+            raise Exception(f"Joined video lasts {duration:.2f}s, the source {source['duration']:.2f}s")
+        
+        digest = hashlib.sha256()
+        with open(joined, "rb") as output:
+            for block in iter(lambda: output.read(1024 * 1024), b""):
+                digest.update(block)
+        shutil.move(joined, output_path)
+        return digest.hexdigest()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,232 @@
+"""Job timings, Prometheus-style counters and histograms, and batch reports."""
+
+import csv
+import http.server
+import json
+import math
+import os
+import statistics
+import threading
+from array import array
+from datetime import datetime
+
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Per-job fields, in report column order
+REPORT_FIELDS = (
+    'url', 'source', 'outcome', 'queue_wait_seconds',
+    'probe_seconds', 'download_seconds', 'download_bytes', 'download_bytes_per_second',
+    'download_bytes_saved', 'fingerprint_seconds', 'clean_seconds', 'clean_path',
+    'transcode_avoided', 'clean_sha256',
+    'upload_seconds', 'upload_bytes', 'upload_bytes_per_second', 'upload_retries',
+    'channel', 'video_id', 'error'
+)
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels) + "}"
+
+class Metrics:
+    """Thread-safe counters and histograms rendered in the Prometheus text format.
+
+    Metric and label names follow Prometheus conventions; labels are passed
+    as keyword arguments, e.g. ``inc("shorts_jobs_total", source="TikTok")``.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['counts'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            header(name, "histogram")
+            for bound, count in zip(self.buckets, histogram['counts']):
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {count}")
+            lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{name}_sum{_label_text(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{_label_text(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """Serve ``metrics.render()`` at ``/metrics`` on a local port from a daemon thread."""
+
+    def __init__(self, metrics, port=9464, host="127.0.0.1"):
+        registry = metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+STAGES = ('queue_wait', 'probe', 'download', 'fingerprint', 'clean', 'upload')
+
+class BatchReport:
+    """A batch's report: a CSV row per job written as it finishes, and a JSON summary at the end.
+
+    Besides the jobs still running, only per-source counts and totals and
+    the stage timings the summary's percentiles need are kept, so memory
+    does not grow with the length of the batch beyond a few floats per job.
+    Files are ``batch-<start time>.csv`` and ``.json`` in ``directory``,
+    created with the first finished job.
+    """
+
+    def __init__(self, directory="reports", started=None):
+        self.directory = directory
+        self.started = started or datetime.now()
+        self.base = os.path.join(directory, f"batch-{self.started.strftime('%Y%m%d-%H%M%S-%f')}")
+        self._lock = threading.Lock()
+        self._running = {}
+        self._sources = {}
+        self._file = None
+        self._writer = None
+
+    def start(self, record):
+        """Track a job's ``record`` until :meth:`finish`; :meth:`close` reports it as "incomplete" otherwise."""
+        with self._lock:
+            self._running[id(record)] = record
+
+    def finish(self, record):
+        """Write a finished job's row; later calls for the same record are ignored."""
+        with self._lock:
+            if self._running.pop(id(record), None) is not None:
+                self._write(record)
+
+    def close(self, finished=None):
+        """Write the summary and return the JSON and CSV paths, or ``(None, None)`` if no job was reported."""
+        with self._lock:
+            for record in self._running.values():
+                record.setdefault('outcome', 'incomplete')
+                self._write(record)
+            self._running = {}
+            if self._writer is None:
+                return None, None
+            self._file.close()
+            finished = finished or datetime.now()
+            with open(f"{self.base}.json", "w", encoding='utf-8') as report:
+                json.dump({
+                    'started': self.started.isoformat(),
+                    'finished': finished.isoformat(),
+                    'wall_seconds': (finished - self.started).total_seconds(),
+                    'summary': self._summary(),
+                    'jobs_csv': os.path.basename(f"{self.base}.csv")
+                }, report, indent=2)
+        return f"{self.base}.json", f"{self.base}.csv"
+
+    def _write(self, record):
+        row = {field: record.get(field) for field in REPORT_FIELDS}
+        if self._writer is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(f"{self.base}.csv", "w", encoding='utf-8', newline='')
+            self._writer = csv.DictWriter(self._file, fieldnames=REPORT_FIELDS)
+            self._writer.writeheader()
+        self._writer.writerow(row)
+        self._file.flush()
+
+        totals = self._sources.get(row['source'])
+        if totals is None:
+            totals = self._sources[row['source']] = {
+                'jobs': 0, 'outcomes': {}, 'stages': {}, 'download_bytes_saved': 0, 'transcodes_avoided': 0}
+        totals['jobs'] += 1
+        totals['outcomes'][row['outcome']] = totals['outcomes'].get(row['outcome'], 0) + 1
+        totals['download_bytes_saved'] += row['download_bytes_saved'] or 0
+        totals['transcodes_avoided'] += 1 if row['transcode_avoided'] else 0
+        for stage in STAGES:
+            value = record.get(f"{stage}_seconds")
+            if value is not None:
+                totals['stages'].setdefault(stage, array('d')).append(value)
+
+    def _summary(self):
+        """Summarize stage timings and format savings per source and name each source's slowest stage."""
+        summary = {}
+        for source in sorted(self._sources, key=str):
+            totals = self._sources[source]
+            stages = {
+                stage: {
+                    'count': len(values),
+                    'mean': statistics.fmean(values),
+                    'p50': _percentile(values, 0.5),
+                    'p95': _percentile(values, 0.95),
+                    'max': max(values)
+                }
+                for stage, values in totals['stages'].items()
+            }
+            working = {stage: numbers for stage, numbers in stages.items() if stage != 'queue_wait'}
+            summary[source] = {
+                'jobs': totals['jobs'],
+                'outcomes': totals['outcomes'],
+                'stages': stages,
+                'download_bytes_saved': totals['download_bytes_saved'],
+                'transcodes_avoided': totals['transcodes_avoided'],
+                'bottleneck': max(working, key=lambda stage: working[stage]['mean']) if working else None
+            }
+        return summary
@@ -0,0 +1,160 @@
+"""Multi-stage worker pipeline."""
+
+import heapq
+import itertools
+import queue
+import threading
+
+class PriorityJobQueue(queue.Queue):
+    """Queue that hands out the item with the lowest ``key(item)`` first, FIFO among equals.
+
+    Priorities are read when an item is put; after changing one in place,
+    call :meth:`reorder`. :meth:`remove` takes waiting items out again.
+    """
+
+    def __init__(self, maxsize=0, key=None):
+        self.key = key or (lambda item: 0)
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        self.queue = []
+        self._counter = itertools.count()
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, item):
+        heapq.heappush(self.queue, [self.key(item), next(self._counter), item])
+
+    def _get(self):
+        return heapq.heappop(self.queue)[2]
+
+    def reorder(self):
+        """Re-read every waiting item's priority."""
+        with self.mutex:
+            for entry in self.queue:
+                entry[0] = self.key(entry[2])
+            heapq.heapify(self.queue)
+
+    def remove(self, match):
+        """Take the waiting items for which ``match(item)`` is true out of the queue and return them."""
+        with self.mutex:
+            kept, removed = [], []
+            for entry in self.queue:
+                (removed if match(entry[2]) else kept).append(entry)
+            if removed:
+                self.queue[:] = kept
+                heapq.heapify(self.queue)
+                self.not_full.notify(len(removed))
+                # Removed items will never see task_done(), so settle them here
+                self.unfinished_tasks -= len(removed)
+                if self.unfinished_tasks == 0:
+                    self.all_tasks_done.notify_all()
+        return [entry[2] for entry in removed]
+
+    def items(self):
+        """Return the waiting items in the order they would be handed out."""
+        with self.mutex:
+            return [entry[2] for entry in sorted(self.queue)]
+
+class StagePipeline:
+    """Run items through a chain of stages, each served by its own worker pool.
+
+    Stages are connected by bounded queues, so a fast stage blocks once it is
+    ``queue_size`` items ahead of a slow one instead of piling up work (and
+    files on disk) in front of it. Each stage is a ``(name, func, workers)``
+    tuple; ``func`` receives an item and returns the item to pass on, or
+    ``None`` to drop it. Exceptions are handed to ``on_error`` and the item
+    is dropped.
+
+    With ``priority``, a function returning an item's sort key, each stage
+    takes the waiting item with the lowest key first (see :meth:`reorder`).
+    ``gates`` maps stage names to Events: while a stage's event is clear its
+    workers take no new items, and :meth:`run` only returns once it is set
+    again.
+    """
+
+    _DONE = object()
+
+    def __init__(self, stages, queue_size=2, on_error=None, priority=None, gates=None):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.on_error = on_error
+        self.priority = priority
+        self.gates = gates or {}
+        self.queues = []
+
+    def run(self, items):
+        """Feed ``items`` through every stage and block until all are finished."""
+        if self.priority:
+            # Stop markers sort after every item
+            key = lambda item: (1,) if item is self._DONE else (0, self.priority(item))
+            queues = [PriorityJobQueue(self.queue_size, key) for _ in self.stages]
+        else:
+            queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        self.queues = queues
+        pools = []
+        for index, (name, func, workers) in enumerate(self.stages):
+            out_queue = queues[index + 1] if index + 1 < len(queues) else None
+            threads = [
+                threading.Thread(
+                    target=self._work,
+                    args=(name, func, queues[index], out_queue),
+                    name=f"{name}-{n}",
+                    daemon=True
+                )
+                for n in range(max(1, workers))
+            ]
+            for thread in threads:
+                thread.start()
+            pools.append(threads)
+
+        try:
+            for item in items:
+                queues[0].put(item)
+        finally:
+            # Shut the stages down in order: a stage only receives its stop
+            # markers once every upstream worker has exited, so nothing that
+            # is still in flight can be stranded behind them.
+            for index, threads in enumerate(pools):
+                for _ in threads:
+                    queues[index].put(self._DONE)
+                for thread in threads:
+                    thread.join()
+
+    def reorder(self):
+        """Re-read the priorities of the items waiting between stages."""
+        for stage_queue in self.queues:
+            if isinstance(stage_queue, PriorityJobQueue):
+                stage_queue.reorder()
+
+    def remove(self, item):
+        """Take ``item`` out if it is waiting between stages; return whether it was."""
+        for stage_queue in self.queues:
+            if isinstance(stage_queue, PriorityJobQueue) and stage_queue.remove(lambda waiting: waiting is item):
+                return True
+        return False
+
+    def _work(self, name, func, in_queue, out_queue):
+        gate = self.gates.get(name)
+        while True:
+            if gate is None:
+                item = in_queue.get()
+            else:
+                # Workers of a paused stage leave the items waiting, where
+                # they can still be reordered or removed
+                gate.wait()
+                try:
+                    item = in_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+            if item is self._DONE:
+                return
+            try:
+                result = func(item)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(name, item, e)
+                continue
+            if result is not None and out_queue is not None:
+                out_queue.put(result)
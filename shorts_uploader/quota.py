@@ -0,0 +1,156 @@
+"""YouTube Data API quota accounting and upload pacing."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# Error reasons meaning "no more uploads until the daily reset"
+QUOTA_ERROR_REASONS = ('quotaExceeded', 'dailyLimitExceeded', 'uploadLimitExceeded')
+
+def pacific_timezone():
+    """Return the timezone YouTube Data API quotas reset in (midnight Pacific)."""
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo("America/Los_Angeles")
+    except Exception:
+        # No tz database (e.g. Windows without tzdata): standard time is
+        # close enough, at worst the reset is an hour late.
+        return timezone(timedelta(hours=-8))
+
+def quota_day(now=None):
+    """Return the quota day (Pacific date, ISO format) ``now`` falls in."""
+    moment = datetime.fromtimestamp(now or time.time(), pacific_timezone())
+    return moment.date().isoformat()
+
+def next_reset(now=None):
+    """Return the epoch time of the next daily quota reset."""
+    zone = pacific_timezone()
+    moment = datetime.fromtimestamp(now or time.time(), zone)
+    midnight = datetime.combine(moment.date() + timedelta(days=1), datetime.min.time(), zone)
+    return midnight.timestamp()
+
+def is_quota_error(error):
+    """Return True if ``error`` is an API error caused by an exhausted quota."""
+    resp = getattr(error, 'resp', None)
+    if resp is None or resp.status not in (403, 429):
+        return False
+    try:
+        content = json.loads(error.content.decode('utf-8'))
+        reasons = [item.get('reason') for item in content['error'].get('errors', [])]
+    except Exception:
+        return False
+    return any(reason in QUOTA_ERROR_REASONS for reason in reasons)
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, holding at most ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1, checkpoint=None):
+        """Block until ``tokens`` are available, then take them.
+
+        ``checkpoint``, if given, is called about every half second while
+        waiting; an exception it raises abandons the wait.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            if checkpoint:
+                checkpoint()
+                wait = min(wait, 0.5)
+            time.sleep(wait)
+
+class QuotaScheduler:
+    """Track API quota spent per project and day, and pace uploads.
+
+    Units are recorded in SQLite so the budget survives restarts.
+    ``reserve`` charges one upload's cost up front and refuses once the
+    daily quota would be exceeded; callers should then park the job until
+    ``next_reset()``, and ``release`` the units again if the upload is
+    dropped before it is sent. ``pace`` holds uploads to ``uploads_per_hour`` (with
+    bursts of up to ``burst``) through a token bucket per project.
+    """
+
+    def __init__(self, path="state/quota.sqlite3", daily_quota=10000, upload_cost=1600,
+                 uploads_per_hour=60, burst=5):
+        self.daily_quota = daily_quota
+        self.upload_cost = upload_cost
+        self.uploads_per_hour = uploads_per_hour
+        self.burst = burst
+        self._buckets = {}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            "project TEXT NOT NULL, day TEXT NOT NULL, units INTEGER NOT NULL, "
+            "PRIMARY KEY (project, day))")
+        self._db.commit()
+
+    def remaining(self, project):
+        """Return the units still available to ``project`` today."""
+        with self._lock:
+            return self.daily_quota - self._used(project, quota_day())
+
+    def reserve(self, project, units=None):
+        """Charge ``units`` (one upload by default) if today's budget allows it."""
+        units = self.upload_cost if units is None else units
+        day = quota_day()
+        with self._lock:
+            used = self._used(project, day)
+            if used + units > self.daily_quota:
+                return False
+            self._set_used(project, day, used + units)
+            return True
+
+    def release(self, project, units=None):
+        """Give back ``units`` charged by ``reserve`` for an upload that never reached the API."""
+        units = self.upload_cost if units is None else units
+        day = quota_day()
+        with self._lock:
+            self._set_used(project, day, max(self._used(project, day) - units, 0))
+
+    def exhaust(self, project):
+        """Mark today's budget as spent, e.g. after the API reported quotaExceeded."""
+        with self._lock:
+            self._set_used(project, quota_day(), self.daily_quota)
+
+    def pace(self, project, checkpoint=None):
+        """Block until the rate limit lets another upload for ``project`` start (see ``TokenBucket.acquire``)."""
+        if not self.uploads_per_hour:
+            return
+        with self._lock:
+            bucket = self._buckets.get(project)
+            if bucket is None:
+                bucket = TokenBucket(self.uploads_per_hour / 3600.0, self.burst)
+                self._buckets[project] = bucket
+        bucket.acquire(checkpoint=checkpoint)
+
+    def next_reset(self):
+        return next_reset()
+
+    def _used(self, project, day):
+        row = self._db.execute(
+            "SELECT units FROM usage WHERE project = ? AND day = ?", (project, day)).fetchone()
+        return row[0] if row else 0
+
+    def _set_used(self, project, day, units):
+        self._db.execute(
+            "INSERT OR REPLACE INTO usage (project, day, units) VALUES (?, ?, ?)",
+            (project, day, units))
+        self._db.commit()
@@ -0,0 +1,144 @@
+"""Remux a remote video with ffmpeg straight into a resumable upload, without temp files."""
+
+import collections
+import queue
+import subprocess
+import threading
+
+from googleapiclient.http import MediaUpload
+
+from .media import ffmpeg_binary, ffmpeg_input_args
+
+def stream_remux_command(stream):
+    """Return the ffmpeg command that strips metadata from ``stream`` into fragmented MP4 on stdout.
+
+    A pipe cannot be seeked back to write the index up front, so the
+    output is fragmented (``empty_moov``) instead of using ``+faststart``.
+    """
+    return [
+        ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-nostdin',
+        *ffmpeg_input_args(stream),
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-c', 'copy',
+        '-map_metadata', '-1',
+        '-map_metadata:s:v', '-1',
+        '-map_metadata:s:a', '-1',
+        '-map_chapters', '-1',
+        '-fflags', '+bitexact',
+        '-flags:v', '+bitexact',
+        '-flags:a', '+bitexact',
+        '-movflags', 'frag_keyframe+empty_moov+default_base_moof',
+        '-f', 'mp4', 'pipe:1'
+    ]
+
+class PipeMediaUpload(MediaUpload):
+    """Resumable media read from a subprocess's stdout through a bounded buffer.
+
+    A reader thread keeps up to ``buffer_size`` bytes of the process output
+    queued while a chunk is on the wire; the pipe blocks the process beyond
+    that, so memory stays bounded by the buffer plus one chunk. ``size()`` is
+    always None, which makes the client send chunks with an unknown total
+    (``bytes a-b/*``) until a short read ends the upload; ``total_size`` is
+    set then. Bytes before the offset the server has
+    acknowledged are dropped, but unacknowledged ones are kept so a chunk
+    can be sent again after a transport error.
+
+    A process that exits with an error fails the upload instead of letting
+    the truncated output finish it.
+    """
+
+    BLOCK_SIZE = 256 * 1024
+
+    def __init__(self, command, mimetype='video/mp4', chunksize=8 * 1024 * 1024,
+                 buffer_size=16 * 1024 * 1024):
+        self._mimetype = mimetype
+        self._chunksize = chunksize
+        self._buffer = bytearray()
+        self._offset = 0  # stream position of self._buffer[0]
+        self._eof = False
+        self._error = None
+        self.total_size = None
+
+        self._process = subprocess.Popen(
+            command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._blocks = queue.Queue(maxsize=max(1, buffer_size // self.BLOCK_SIZE))
+        self._stderr = collections.deque(maxlen=20)
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+    def _read_stdout(self):
+        try:
+            while True:
+                block = self._process.stdout.read(self.BLOCK_SIZE)
+                if not block:
+                    break
+                self._blocks.put(block)
+        finally:
+            self._blocks.put(b"")
+
+    def _read_stderr(self):
+        for line in self._process.stderr:
+            self._stderr.append(line.decode(errors='replace').rstrip())
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        return None
+
+    def resumable(self):
+        return True
+
+    def has_stream(self):
+        return False
+
+    def getbytes(self, begin, length):
+        """Return up to ``length`` bytes from stream offset ``begin``; fewer only at the end.
+
+        A full chunk is only returned once at least one more byte is known
+        to follow, so the last chunk is always a short one that tells the
+        server the total size.
+        """
+        if self._error is not None:
+            raise self._error
+        if begin < self._offset:
+            raise Exception(f"Stream offset {begin} was already discarded")
+        wanted = begin - self._offset + length + 1
+        while len(self._buffer) < wanted and not self._eof:
+            block = self._blocks.get()
+            if block:
+                self._buffer += block
+            else:
+                self._finish()
+
+        drop = min(begin - self._offset, len(self._buffer))
+        del self._buffer[:drop]
+        self._offset += drop
+        return bytes(self._buffer[:length])
+
+    def _finish(self):
+        self._eof = True
+        self._process.wait()
+        if self._process.returncode != 0:
+            detail = " ".join(self._stderr) or f"exit code {self._process.returncode}"
+            self._error = Exception(f"Stream remux failed: {detail[-500:]}")
+            raise self._error
+        self.total_size = self._offset + len(self._buffer)
+
+    def close(self):
+        """Stop the process if it is still running and release the buffer."""
+        if self._process.poll() is None:
+            self._process.kill()
+        if not self._eof:
+            # Drain until the reader thread's end marker so it never blocks on a full queue
+            self._eof = True
+            while self._blocks.get():
+                pass
+        self._process.wait()
+        self._buffer = bytearray()
+
+    def to_json(self):
+        raise NotImplementedError("a pipe cannot be serialized")
@@ -0,0 +1,104 @@
+"""Chunked resumable uploads with retries."""
+
+import random
+import time
+
+# Server responses and transport errors worth retrying during an upload;
+# httplib2's own transport errors are added when an upload starts.
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+RETRYABLE_EXCEPTIONS = (OSError,)
+
+class ChunkedUploader:
+    """Drive a resumable upload with ``next_chunk()`` until the server answers.
+
+    Retryable failures (5xx, 408/429, socket and httplib2 errors) are retried
+    with exponential backoff and full jitter; the retry budget resets after
+    every chunk that goes through. With ``adaptive`` set, the chunk size is
+    retuned after each chunk so one chunk takes roughly ``target_seconds``
+    at the measured throughput. ``progress(sent, total)`` is called after
+    each chunk (``total`` is None for streams of unknown size) and ``on_session(uri)`` once the session URI is known.
+    ``checkpoint()``, if given, is called before every chunk; it may block
+    to pause the upload or raise to abandon it.
+    """
+
+    CHUNK_UNIT = 256 * 1024  # resumable chunks must be multiples of 256 KiB
+
+    def __init__(self, adaptive=True, target_seconds=4.0, min_chunk_size=CHUNK_UNIT,
+                 max_chunk_size=128 * 1024 * 1024, max_retries=8, backoff_base=1.0,
+                 backoff_cap=64.0, progress=None, on_session=None, http=None, sleep=time.sleep,
+                 checkpoint=None):
+        self.adaptive = adaptive
+        self.target_seconds = target_seconds
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.progress = progress
+        self.on_session = on_session
+        self.http = http
+        self.sleep = sleep
+        self.checkpoint = checkpoint
+        self.retries = 0
+
+    def run(self, request):
+        """Upload everything behind ``request`` and return the final response body."""
+        import httplib2
+        from googleapiclient.errors import HttpError
+        
+        retryable_exceptions = RETRYABLE_EXCEPTIONS + (httplib2.HttpLib2Error,)
+        media = request.resumable
+        total = media.size()
+        session_uri = request.resumable_uri
+        attempts = 0
+        response = None
+        
+        while response is None:
+            if self.checkpoint:
+                self.checkpoint()
+            sent_before = request.resumable_progress
+            started = time.monotonic()
+            try:
+                _, response = request.next_chunk(http=self.http)
+            except HttpError as e:
+                if e.resp.status not in RETRYABLE_STATUS_CODES:
+                    raise
+                error = e
+            except retryable_exceptions as e:
+                # The chunk may have partially arrived; make the next call
+                # ask the server for the acknowledged range first.
+                request._in_error_state = True
+                error = e
+            else:
+                attempts = 0
+                if self.on_session and request.resumable_uri != session_uri:
+                    session_uri = request.resumable_uri
+                    self.on_session(session_uri)
+                
+                sent = request.resumable_progress
+                if response is not None:
+                    # Streams of unknown size only learn it at the end
+                    sent = total if total is not None else getattr(media, 'total_size', sent)
+                if self.adaptive and response is None:
+                    self._retune(media, sent - sent_before, time.monotonic() - started)
+                if self.progress:
+                    self.progress(sent, total)
+                continue
+            
+            attempts += 1
+            self.retries += 1
+            if attempts > self.max_retries:
+                raise error
+            self.sleep(random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (attempts - 1))))
+        
+        return response
+
+    def _retune(self, media, sent, elapsed):
+        if sent <= 0 or elapsed <= 0:
+            return
+        wanted = sent / elapsed * self.target_seconds
+        # Move halfway towards the target to damp jitter in the measurements
+        size = (media.chunksize() + wanted) / 2
+        size = int(size // self.CHUNK_UNIT) * self.CHUNK_UNIT
+        # MediaUpload exposes no setter; next_chunk reads the size per call
+        media._chunksize = max(self.min_chunk_size, min(self.max_chunk_size, size))
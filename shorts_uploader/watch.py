@@ -0,0 +1,291 @@
+"""Drop-folder ingestion: queue local videos as soon as they finish arriving."""
+
+import os
+import sqlite3
+import threading
+import time
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+
+class FolderIndex:
+    """Persistent record of the files and directories a watched folder has shown.
+
+    Files are stored with their inode, size and mtime and the time they were
+    queued (None while they are still settling), directories with the mtime
+    they had when they were last listed.
+    """
+
+    def __init__(self, path="state/watch.sqlite3"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, dir TEXT NOT NULL, inode INTEGER NOT NULL, "
+            "size INTEGER NOT NULL, mtime REAL NOT NULL, queued REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_dir ON files (dir)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_inode ON files (inode)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime REAL NOT NULL)")
+        self._db.commit()
+
+    def file(self, path):
+        """Return ``(inode, size, mtime, queued)`` for ``path``, or None."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT inode, size, mtime, queued FROM files WHERE path = ?", (path,)).fetchone()
+
+    def queued_elsewhere(self, signature):
+        """Return the path a queued file with the same ``(inode, size, mtime)`` was seen at, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path FROM files WHERE inode = ? AND size = ? AND mtime = ? AND queued IS NOT NULL",
+                signature).fetchone()
+        return row[0] if row else None
+
+    def pending(self):
+        """Return the paths that were seen but not queued yet."""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT path FROM files WHERE queued IS NULL")]
+
+    def see(self, path, signature):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (path, dir, inode, size, mtime, queued) VALUES (?, ?, ?, ?, ?, NULL)",
+                (path, os.path.dirname(path), *signature))
+            self._db.commit()
+
+    def mark_queued(self, path, signature):
+        with self._lock:
+            self._db.execute(
+                "UPDATE files SET inode = ?, size = ?, mtime = ?, queued = ? WHERE path = ?",
+                (*signature, time.time(), path))
+            self._db.commit()
+
+    def move(self, old_path, new_path):
+        with self._lock:
+            self._db.execute(
+                "UPDATE files SET path = ?, dir = ? WHERE path = ?",
+                (new_path, os.path.dirname(new_path), old_path))
+            self._db.commit()
+
+    def forget(self, path):
+        with self._lock:
+            self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._db.commit()
+
+    def forget_missing(self, directory, names):
+        """Drop the files recorded in ``directory`` that are not among ``names``."""
+        with self._lock:
+            rows = self._db.execute("SELECT path FROM files WHERE dir = ?", (directory,)).fetchall()
+            gone = [(path,) for (path,) in rows if os.path.basename(path) not in names]
+            if gone:
+                self._db.executemany("DELETE FROM files WHERE path = ?", gone)
+                self._db.commit()
+
+    def dirs(self, root):
+        """Return ``{path: mtime}`` for the recorded directories at or below ``root``."""
+        prefix = os.path.join(root, "")
+        with self._lock:
+            rows = self._db.execute("SELECT path, mtime FROM dirs").fetchall()
+        return {path: mtime for path, mtime in rows if path == root or path.startswith(prefix)}
+
+    def set_dir(self, path, mtime):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO dirs (path, mtime) VALUES (?, ?)", (path, mtime))
+            self._db.commit()
+
+    def forget_dir(self, path):
+        with self._lock:
+            self._db.execute("DELETE FROM dirs WHERE path = ?", (path,))
+            self._db.execute("DELETE FROM files WHERE dir = ?", (path,))
+            self._db.commit()
+
+class FolderWatcher:
+    """Queue every video that lands in ``directory`` (or below it) on ``engine``.
+
+    Scans are incremental: a directory is only listed again when its mtime
+    changed, which adding, removing or renaming an entry does. Files that
+    are still being written are debounced until their size and mtime have
+    held still for ``settle_seconds``. A queued file is recorded in the
+    index (and the engine's journal) before it is submitted, so a restart
+    never queues it again, and a queued file that is only renamed or moved
+    keeps its inode and is recognized as well.
+
+    With the optional ``watchdog`` package, inotify (or the platform's
+    equivalent) wakes the watcher as soon as something changes and a full
+    scan only runs every ``rescan_seconds`` as a safety net; without it the
+    folder is polled every ``interval`` seconds. ``defaults`` supplies each
+    job's ``title``, ``caption``, ``privacy`` and optional ``channel``;
+    "{name}" in the title is replaced by the file name without extension.
+    """
+
+    # Directory mtimes this close to the scan may still change within the
+    # filesystem's timestamp resolution, so they are listed again next time
+    MTIME_SLACK = 2.0
+
+    def __init__(self, engine, directory, defaults, index_path="state/watch.sqlite3",
+                 interval=2.0, settle_seconds=3.0, rescan_seconds=60.0):
+        self.engine = engine
+        self.logger = engine.logger
+        self.directory = os.path.abspath(directory)
+        self.defaults = defaults
+        self.index = FolderIndex(index_path)
+        self.interval = interval
+        self.settle_seconds = settle_seconds
+        self.rescan_seconds = rescan_seconds
+        self._pending = {}  # path -> (signature, monotonic time it was first seen as such)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def run(self):
+        """Watch until :meth:`stop` is called."""
+        if not os.path.isdir(self.directory):
+            raise Exception(f"{self.directory} is not a directory")
+        for path in self.index.pending():
+            if path.startswith(os.path.join(self.directory, "")):
+                self._pending[path] = (None, time.monotonic())
+
+        observer = self._start_observer()
+        if observer:
+            self.logger.log(f"Watching {self.directory} for new videos")
+        else:
+            self.logger.log(f"Watching {self.directory} for new videos (polling every {self.interval}s)")
+        try:
+            while not self._stop.is_set():
+                # Cleared before the scan so changes made during it wake the next one
+                self._wake.clear()
+                try:
+                    self.scan()
+                except Exception as e:
+                    self.logger.log(f"Scanning {self.directory} failed: {str(e)}", "ERROR")
+                # Settling files are checked again soon; otherwise wait for an event
+                timeout = self.rescan_seconds if observer and not self._pending else self.interval
+                self._wake.wait(timeout)
+        finally:
+            if observer:
+                observer.stop()
+                observer.join()
+        self.logger.log(f"Stopped watching {self.directory}")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _start_observer(self):
+        """Start a watchdog observer that wakes the scan loop, or return None without watchdog."""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+
+        wake = self._wake
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        observer = Observer()
+        observer.schedule(Handler(), self.directory, recursive=True)
+        observer.start()
+        return observer
+
+    def scan(self):
+        """List changed directories, then queue the files that have settled; return how many were queued."""
+        known = self.index.dirs(self.directory)
+        known.setdefault(self.directory, None)
+        to_list = []
+        gone = []
+        for path, mtime in known.items():
+            try:
+                current = os.stat(path).st_mtime
+            except FileNotFoundError:
+                gone.append(path)
+                continue
+            if current != mtime:
+                to_list.append(path)
+
+        listed = {}
+        while to_list:
+            directory = to_list.pop()
+            listed[directory], new_dirs = self._list_dir(directory, known)
+            known.update(dict.fromkeys(new_dirs))
+            to_list.extend(new_dirs)
+        # Only now, so files moved between directories (or with a renamed
+        # directory) were recognized at their new place first
+        for directory, names in listed.items():
+            self.index.forget_missing(directory, names)
+        for directory in gone:
+            self.index.forget_dir(directory)
+
+        queued = 0
+        now = time.monotonic()
+        for path, (signature, since) in list(self._pending.items()):
+            try:
+                current = self._signature(os.stat(path))
+            except FileNotFoundError:
+                del self._pending[path]
+                self.index.forget(path)
+                continue
+            if current != signature:
+                # Still growing (or just found again after a restart)
+                self._pending[path] = (current, now)
+                continue
+            if now - since >= self.settle_seconds:
+                del self._pending[path]
+                self._queue(path, signature)
+                queued += 1
+        return queued
+
+    def _list_dir(self, directory, known):
+        """Record the videos in ``directory``; return their names and the subdirectories not in ``known``."""
+        mtime = os.stat(directory).st_mtime
+        new_dirs = []
+        names = set()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in known:
+                        new_dirs.append(entry.path)
+                elif entry.name.lower().endswith(VIDEO_EXTENSIONS):
+                    names.add(entry.name)
+                    self._observe(entry.path, entry.stat())
+        # A change within the timestamp resolution could still hide behind this mtime
+        recorded = mtime if time.time() - mtime > self.MTIME_SLACK else -1
+        self.index.set_dir(directory, recorded)
+        return names, new_dirs
+
+    def _observe(self, path, stat):
+        if path in self._pending:
+            return
+        signature = self._signature(stat)
+        row = self.index.file(path)
+        if row is not None and row[3] is not None and tuple(row[:3]) == signature:
+            return
+        if row is None:
+            moved_from = self.index.queued_elsewhere(signature)
+            if moved_from and not os.path.exists(moved_from):
+                self.index.move(moved_from, path)
+                return
+        self.index.see(path, signature)
+        self._pending[path] = (signature, time.monotonic())
+
+    def _signature(self, stat):
+        return (stat.st_ino, stat.st_size, stat.st_mtime)
+
+    def _queue(self, path, signature):
+        name = os.path.splitext(os.path.basename(path))[0]
+        # A later file under the same name has another signature and so
+        # another journal record, instead of finding this one "done"
+        upload_data = dict(self.defaults, url=path, source="Local File",
+                           file_signature=":".join(str(part) for part in signature))
+        upload_data['title'] = (upload_data.get('title') or "{name}").replace("{name}", name)
+        # Journal first: once the file is marked queued, only the journal can bring it back
+        self.engine.journal.begin(upload_data)
+        self.index.mark_queued(path, signature)
+        self.logger.log(f"New video in watch folder: {path}")
+        self.engine.submit(upload_data)